@@ -0,0 +1,459 @@
+"""
+Benchmarks for the degrees project.
+
+Usage: python benchmark.py <benchmark> [options]
+Run `python benchmark.py -h` for the list of benchmarks.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import degrees
+from nameindex import NameIndex
+from util import (Node, StackFrontier, QueueFrontier,
+                  DequeStackFrontier, DequeQueueFrontier)
+
+
+def star_graph(edges):
+    """
+    Return adjacency for a star graph: hub 0 linked to `edges` leaves.
+    """
+    adjacency = {0: list(range(1, edges + 1))}
+    for leaf in range(1, edges + 1):
+        adjacency[leaf] = [0]
+    return adjacency
+
+
+def search(adjacency, frontier_class, start=0):
+    """
+    Explore every state reachable from `start` using `frontier_class`,
+    mirroring how `shortest_path` uses its frontier.
+    Return the number of states explored.
+    """
+    front = frontier_class()
+    front.add(Node(state=start, parent=None, action=None))
+    explored = set()
+    while not front.empty():
+        node = front.remove()
+        explored.add(node.state)
+        for state in adjacency[node.state]:
+            if not front.contains_state(state) and state not in explored:
+                front.add(Node(state=state, parent=node, action=None))
+    return len(explored)
+
+
+def timed(function, *args):
+    """
+    Return (result, seconds) for calling `function(*args)`.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_frontiers(args):
+    """
+    Compare list-backed and deque-backed frontiers on a star graph.
+    """
+    # List-backed frontiers are quadratic, so they get a smaller graph
+    legacy_edges = min(args.edges, args.legacy_edges)
+    cases = [
+        ("StackFrontier", StackFrontier, legacy_edges),
+        ("QueueFrontier", QueueFrontier, legacy_edges),
+        ("DequeStackFrontier", DequeStackFrontier, args.edges),
+        ("DequeQueueFrontier", DequeQueueFrontier, args.edges),
+    ]
+    graphs = dict()
+    print(f"{'frontier':<20} {'edges':>10} {'seconds':>10} {'us/node':>10}")
+    for name, frontier_class, edges in cases:
+        if edges not in graphs:
+            graphs[edges] = star_graph(edges)
+        explored, seconds = timed(search, graphs[edges], frontier_class)
+        print(f"{name:<20} {edges:>10} {seconds:>10.3f} "
+              f"{seconds / explored * 1e6:>10.2f}")
+
+
+def generate(args):
+    """
+    Write a synthetic people/movies/stars dataset to a directory.
+    Casts are drawn with a skew towards low ids so some people are hubs.
+    """
+    rng = random.Random(args.seed)
+    os.makedirs(args.directory, exist_ok=True)
+    with open(os.path.join(args.directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(args.people):
+            writer.writerow([i, f"Person {i}", 1900 + i % 100])
+    with open(os.path.join(args.directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(args.movies):
+            writer.writerow([i, f"Movie {i}", 1950 + i % 70])
+    with open(os.path.join(args.directory, "stars.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(args.movies):
+            cast = {
+                int(args.people * rng.random() ** 2)
+                for _ in range(rng.randint(1, 2 * args.cast))
+            }
+            for person in cast:
+                writer.writerow([person, movie])
+    print(f"Wrote {args.people} people and {args.movies} movies "
+          f"to {args.directory}.")
+
+
+def load(args):
+    """
+    Load `args.directory` the way `args` asks for, printing the time taken.
+    """
+    print("Loading data...")
+    _, seconds = timed(degrees.load_data, args.directory, args.compact,
+                       getattr(args, "cache", False))
+    print(f"Data loaded in {seconds:.2f}s.")
+
+
+def reset():
+    """
+    Forget any data loaded into the degrees module.
+    """
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+
+
+def bench_load(args):
+    """
+    Time the dictionary loader, a cold snapshot build and a warm
+    snapshot load of the same directory.
+    """
+    cases = [
+        ("dicts", dict()),
+        ("compact", dict(compact=True)),
+        ("snapshot cold", dict(rebuild_cache=True)),
+        ("snapshot warm", dict(cache=True)),
+    ]
+    print(f"{'loader':<15} {'source':>10} {'seconds':>10}")
+    for name, options in cases:
+        reset()
+        source, seconds = timed(
+            lambda: degrees.load_data(args.directory, **options)
+        )
+        print(f"{name:<15} {source:>10} {seconds:>10.3f}")
+
+
+# load_data options for each loader compared by `bench_memory`
+LOADERS = {
+    "dicts": dict(),
+    "compact": dict(compact=True),
+    "snapshot": dict(cache=True),
+    "lean": dict(lean=True),
+}
+
+
+def measure_rss(args):
+    """
+    Load with one loader and print its peak RSS as JSON. Run in a fresh
+    process by `bench_memory` so loaders don't share a high-water mark.
+    """
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    _, seconds = timed(
+        lambda: degrees.load_data(args.directory, **LOADERS[args.loader])
+    )
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    print(json.dumps({
+        "seconds": seconds,
+        "baseline": baseline * scale,
+        "peak": peak * scale,
+    }))
+
+
+def bench_memory(args):
+    """
+    Compare the peak RSS of each loader, each in its own process.
+    """
+    print(f"{'loader':<10} {'seconds':>10} {'peak MB':>10} {'loaded MB':>10}")
+    for loader in LOADERS:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "rss",
+             args.directory, "--loader", loader],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.splitlines()[-1])
+        print(f"{loader:<10} {result['seconds']:>10.2f} "
+              f"{result['peak'] / 1e6:>10.1f} "
+              f"{(result['peak'] - result['baseline']) / 1e6:>10.1f}")
+
+
+# Distinct names in the full IMDb people.csv, the scale lookups must
+# stay sub-millisecond at
+IMDB_NAMES = 918000
+
+# Syllables synthetic names are built from, so their trigrams are
+# spread roughly like real names': a few very common, most rare
+SYLLABLES = (
+    "an ar be bo ca da de el en er fa ga ha he ia in is ja jo ka ke la "
+    "le li lo ma me mi mo na ne ni no ra re ri ro sa se si so ta te ti "
+    "to va ve wi ya ze ch sh th st ll tt son ton ley ner man berg ski "
+    "ez ov ard ine ette y"
+).split()
+
+
+def synthetic_names(count, rng):
+    """
+    Return `count` distinct lowercase "first last" names built from
+    SYLLABLES, first names from a smaller pool as in real casts.
+    """
+    def word(syllables):
+        return "".join(rng.choice(SYLLABLES) for _ in range(syllables))
+
+    first_names = [word(rng.randint(2, 3)) for _ in range(count // 200 + 1)]
+    names = set()
+    while len(names) < count:
+        names.add(f"{rng.choice(first_names)} {word(rng.randint(2, 4))}")
+    return names
+
+
+def typo(name, rng):
+    """
+    Return `name` with one random character dropped or two swapped.
+    """
+    if len(name) < 3:
+        return name
+    i = rng.randrange(len(name) - 1)
+    if rng.random() < 0.5:
+        return name[:i] + name[i + 1:]
+    return name[:i] + name[i + 1] + name[i] + name[i + 2:]
+
+
+def latencies(function, queries):
+    """
+    Return the sorted per-call latencies of `function` over `queries`,
+    in microseconds.
+    """
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        function(query)
+        results.append((time.perf_counter() - start) * 1e6)
+    return sorted(results)
+
+
+def bench_names(args):
+    """
+    Report name index build time and prefix/fuzzy lookup latencies,
+    over a dataset or, with `--synthetic`, over that many generated
+    names (IMDb scale by default).
+    """
+    rng = random.Random(args.seed)
+    if args.synthetic is not None:
+        names = synthetic_names(args.synthetic, rng)
+        index, seconds = timed(NameIndex, names)
+    else:
+        load(args)
+        _, seconds = timed(degrees.get_name_index)
+        index = degrees.name_index
+    print(f"Indexed {len(index.names)} names in {seconds:.2f}s.")
+
+    sample = [rng.choice(index.names) for _ in range(args.queries)]
+    cases = [
+        ("prefix", index.prefix,
+         [name[:rng.randint(3, max(3, len(name)))] for name in sample]),
+        ("fuzzy", index.fuzzy, [typo(name, rng) for name in sample]),
+        ("suggest", index.suggest, [typo(name, rng) for name in sample]),
+    ]
+    print(f"{'lookup':<10} {'queries':>8} {'p50 us':>10} {'p99 us':>10}")
+    slow = []
+    for name, function, queries in cases:
+        times = latencies(function, queries)
+        p99 = times[int(len(times) * 0.99)]
+        print(f"{name:<10} {len(times):>8} {times[len(times) // 2]:>10.1f} "
+              f"{p99:>10.1f}")
+        if p99 >= 1000:
+            slow.append(name)
+
+    hits = sum(
+        name in index.suggest(typo(name, rng), limit=5) for name in sample
+    )
+    print(f"Intended name among top 5 suggestions for "
+          f"{hits / len(sample):.0%} of typos.")
+    if slow:
+        print(f"Over the 1 ms p99 target: {', '.join(slow)}.")
+    else:
+        print("Every lookup is within the 1 ms p99 target.")
+
+
+def bench_strategies(args):
+    """
+    Time each search strategy on randomly sampled pairs of people.
+    """
+    load(args)
+
+    rng = random.Random(args.seed)
+    if degrees.graph is not None:
+        person_ids = list(degrees.graph.person_ids)
+    else:
+        person_ids = sorted(degrees.people)
+    pairs = [tuple(rng.sample(person_ids, 2)) for _ in range(args.pairs)]
+
+    # The landmark strategy only runs on the compact graph
+    if degrees.graph is not None:
+        degrees.load_landmarks(args.directory, args.landmarks)
+    strategies = {
+        name: strategy for name, strategy in degrees.STRATEGIES.items()
+        if name != "landmarks" or degrees.landmark_index is not None
+    }
+    compare(strategies, pairs)
+
+
+def compare(strategies, pairs):
+    """
+    Time each of `strategies` on `pairs`, checking they all agree.
+    Return the total seconds taken by each strategy.
+    """
+    lengths = dict()
+    totals = dict()
+    print(f"{'strategy':<15} {'pairs':>6} {'total s':>10} {'ms/pair':>10}")
+    for name, strategy in sorted(strategies.items()):
+        total = 0
+        for source, target in pairs:
+            path, seconds = timed(strategy, source, target)
+            total += seconds
+            length = None if path is None else len(path)
+            # Every strategy must agree on the degrees of separation
+            if lengths.setdefault((source, target), length) != length:
+                raise Exception(
+                    f"{name} found {length} degrees for {source} -> "
+                    f"{target}, expected {lengths[(source, target)]}"
+                )
+        totals[name] = total
+        print(f"{name:<15} {len(pairs):>6} {total:>10.3f} "
+              f"{total / len(pairs) * 1e3:>10.3f}")
+    return totals
+
+
+def bench_landmarks(args):
+    """
+    Report the landmark index build cost and the per-query speedup of
+    landmark-guided search, plus single-source BFS for shared sources.
+    """
+    args.compact = True
+    load(args)
+    _, seconds = timed(degrees.load_landmarks, args.directory,
+                       args.landmarks, True)
+    size = os.path.getsize(os.path.join(args.directory, ".degrees-landmarks"))
+    print(f"Built {args.landmarks} landmarks in {seconds:.2f}s "
+          f"({size / 1e6:.1f} MB on disk).")
+
+    rng = random.Random(args.seed)
+    person_ids = list(degrees.graph.person_ids)
+    pairs = [tuple(rng.sample(person_ids, 2)) for _ in range(args.pairs)]
+    totals = compare(degrees.STRATEGIES, pairs)
+    for name in sorted(totals):
+        if name != "landmarks" and totals["landmarks"] > 0:
+            print(f"landmarks vs {name}: "
+                  f"{totals[name] / totals['landmarks']:.2f}x")
+
+    # Many targets sharing one source: one single-source BFS answers all
+    source = pairs[0][0]
+    targets = [target for _, target in pairs]
+    start = time.perf_counter()
+    parents = degrees.single_source(source)
+    for target in targets:
+        degrees.path_from(source, target, parents)
+    seconds = time.perf_counter() - start
+    print(f"single_source + {len(targets)} paths from one source: "
+          f"{seconds:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for degrees.")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    generator = benchmarks.add_parser(
+        "generate", help="write a synthetic dataset")
+    generator.add_argument("directory")
+    generator.add_argument("--people", type=int, default=100000)
+    generator.add_argument("--movies", type=int, default=50000)
+    generator.add_argument("--cast", type=int, default=5,
+                           help="average number of stars per movie")
+    generator.add_argument("--seed", type=int, default=0)
+    generator.set_defaults(run=generate)
+
+    frontiers = benchmarks.add_parser(
+        "frontiers", help="list vs deque frontiers on a star graph")
+    frontiers.add_argument("--edges", type=int, default=1000000)
+    frontiers.add_argument("--legacy-edges", type=int, default=20000,
+                           help="graph size cap for the list-backed frontiers")
+    frontiers.set_defaults(run=bench_frontiers)
+
+    strategies = benchmarks.add_parser(
+        "strategies", help="search strategies on random person pairs")
+    strategies.add_argument("directory", nargs="?", default="small")
+    strategies.add_argument("--pairs", type=int, default=100)
+    strategies.add_argument("--seed", type=int, default=0)
+    strategies.add_argument("--compact", action="store_true",
+                            help="search the integer-indexed CSR graph")
+    strategies.add_argument("--cache", action="store_true",
+                            help="load the compact graph from its snapshot")
+    strategies.add_argument("--landmarks", type=int, default=16)
+    strategies.set_defaults(run=bench_strategies)
+
+    loaders = benchmarks.add_parser(
+        "load", help="CSV loaders vs cold and warm snapshot loads")
+    loaders.add_argument("directory", nargs="?", default="small")
+    loaders.set_defaults(run=bench_load)
+
+    landmarks = benchmarks.add_parser(
+        "landmarks", help="landmark index build cost and query speedup")
+    landmarks.add_argument("directory", nargs="?", default="small")
+    landmarks.add_argument("--landmarks", type=int, default=16)
+    landmarks.add_argument("--pairs", type=int, default=100)
+    landmarks.add_argument("--seed", type=int, default=0)
+    landmarks.add_argument("--cache", action="store_true",
+                           help="load the compact graph from its snapshot")
+    landmarks.set_defaults(run=bench_landmarks)
+
+    lookups = benchmarks.add_parser(
+        "names", help="prefix/fuzzy name lookup latency")
+    lookups.add_argument("directory", nargs="?", default="small")
+    lookups.add_argument("--queries", type=int, default=1000)
+    lookups.add_argument("--seed", type=int, default=0)
+    lookups.add_argument("--compact", action="store_true")
+    lookups.add_argument("--cache", action="store_true")
+    lookups.add_argument("--synthetic", type=int, nargs="?", metavar="N",
+                         const=IMDB_NAMES,
+                         help="index N generated names instead of a dataset "
+                              f"(default {IMDB_NAMES}, IMDb scale)")
+    lookups.set_defaults(run=bench_names)
+
+    memory = benchmarks.add_parser(
+        "memory", help="peak RSS of each loader")
+    memory.add_argument("directory", nargs="?", default="small")
+    memory.set_defaults(run=bench_memory)
+
+    rss = benchmarks.add_parser(
+        "rss", help="peak RSS of one loader (used by the memory benchmark)")
+    rss.add_argument("directory")
+    rss.add_argument("--loader", choices=sorted(LOADERS), required=True)
+    rss.set_defaults(run=measure_rss)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
+import argparse
 import csv
+import itertools
+import json
+import multiprocessing
 import sys
+import time
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import load_graph
+from landmarks import load_index
+from lean import load_lean_graph, people_names
+from nameindex import NameIndex
+from snapshot import load_cached_graph
+from util import Node, DequeQueueFrontier, SearchStats
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +22,46 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Most paths `all_shortest_paths` will return, however many exist
+MAX_PATHS = 1000
 
-def load_data(directory):
+# Compact integer-indexed graph, used instead of `people` and `movies`
+# when data is loaded with `compact=True`
+graph = None
+
+# Data directory whose people.csv is scanned for names, set when `graph`
+# was loaded lean and `names` is left empty until the name index needs it
+lean_directory = None
+
+# Landmark distance index over `graph`, used by the "landmarks" strategy
+landmark_index = None
+
+# Prefix/fuzzy index over `names`, built on first use by `get_name_index`
+name_index = None
+
+
+def load_data(directory, compact=False, cache=False, rebuild_cache=False,
+              lean=False):
     """
     Load data from CSV files into memory.
+
+    With `compact`, build an integer-indexed CSR `Graph` instead of
+    the `people` and `movies` dictionaries. With `cache` (which implies
+    `compact`), load that graph from a binary snapshot of the CSV files,
+    (re)building the snapshot first when it is missing, stale,
+    or `rebuild_cache` is set. With `lean`, stream the files into a
+    graph holding only the adjacency and read names back from the files
+    when needed.
+
+    Returns where the data came from: "csv" or "snapshot".
     """
+    if lean:
+        return load_lean(directory)
+    if cache or rebuild_cache:
+        return load_compact(directory, cache=True, rebuild=rebuild_cache)
+    if compact:
+        return load_compact(directory)
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,16 +96,187 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    return "csv"
+
+
+def load_compact(directory, cache=False, rebuild=False):
+    """
+    Load data from CSV files, or their snapshot with `cache`,
+    into the compact `graph`.
+    Returns where the data came from: "csv" or "snapshot".
+    """
+    global graph
+    source = "csv"
+    if cache:
+        graph, built = load_cached_graph(directory, rebuild=rebuild)
+        if not built:
+            source = "snapshot"
+    else:
+        graph = load_graph(directory)
+    for person_id, name in zip(graph.person_ids, graph.person_names):
+        names.setdefault(name.lower(), set()).add(person_id)
+    return source
+
+
+def load_lean(directory):
+    """
+    Stream data from CSV files into a lean compact `graph`.
+    """
+    global graph, lean_directory
+    graph = load_lean_graph(directory)
+    lean_directory = directory
+    return "csv"
+
+
+def person_ids_named(name):
+    """
+    Returns the set of person_ids with the given name, ignoring case.
+    """
+    if lean_directory is not None and not names:
+        return {
+            graph.person_ids[person]
+            for person in graph.name_lookup.find(name)
+        }
+    return names.get(name.lower(), set())
+
+
+def load_landmarks(directory, k, rebuild=False):
+    """
+    Load (or build and save) a `k`-landmark distance index over the
+    compact `graph`.
+    Returns whether the index had to be built.
+    """
+    global landmark_index
+    landmark_index, built = load_index(graph, directory, k, rebuild=rebuild)
+    return built
+
+
+def get_name_index():
+    """
+    Returns the prefix/fuzzy index over `names`, building it the
+    first time it is needed. Names are ranked by how many movies the
+    people with that name starred in. A lean load leaves `names` empty,
+    so they are streamed from people.csv first.
+    """
+    global name_index
+    if name_index is None:
+        if lean_directory is not None and not names:
+            names.update(people_names(lean_directory))
+        weights = dict()
+        for name, person_ids in names.items():
+            weights[name] = sum(movie_count(p) for p in person_ids)
+        name_index = NameIndex(names, weights)
+    return name_index
+
+
+def movie_count(person_id):
+    """
+    Returns the number of movies a person starred in.
+    """
+    if graph is not None:
+        person = graph.person_index[person_id]
+        return graph.person_offsets[person + 1] - graph.person_offsets[person]
+    return len(people[person_id]["movies"])
+
+
+def person_name(person_id):
+    """
+    Returns the name of a person, from whichever data is loaded.
+    """
+    if graph is not None:
+        return graph.person_names[graph.person_index[person_id]]
+    return people[person_id]["name"]
+
+
+def person_birth(person_id):
+    """
+    Returns the birth year of a person, from whichever data is loaded.
+    """
+    if graph is not None:
+        return graph.person_births[graph.person_index[person_id]]
+    return people[person_id]["birth"]
+
+
+def movie_title(movie_id):
+    """
+    Returns the title of a movie, from whichever data is loaded.
+    """
+    if graph is not None:
+        return graph.movie_titles[graph.movie_index[movie_id]]
+    return movies[movie_id]["title"]
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "small"
+    parser = argparse.ArgumentParser(
+        description="Find degrees of separation between two people.")
+    parser.add_argument("directory", nargs="?", default="small")
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES),
+                        default="bfs", help="search used to find the path")
+    parser.add_argument("--compact", action="store_true",
+                        help="load an integer-indexed CSR graph")
+    parser.add_argument("--cache", action="store_true",
+                        help="load the compact graph from a binary snapshot")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="rebuild the snapshot from the CSV files")
+    parser.add_argument("--lean", action="store_true",
+                        help="keep only the adjacency in memory and read "
+                             "names from the CSV files when needed")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer one query per line of FILE ('-' for "
+                             "stdin) as JSON lines")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes answering --batch queries")
+    parser.add_argument("--landmarks", type=int, default=16, metavar="K",
+                        help="landmarks indexed for the landmarks strategy")
+    parser.add_argument("--stats", action="store_true",
+                        help="emit search statistics as JSON lines")
+    parser.add_argument("--paths", type=int, metavar="N",
+                        help="list up to N of all the shortest connections")
+    args = parser.parse_args()
+    if args.lean and (args.cache or args.rebuild_cache):
+        parser.error("--lean can't be combined with the snapshot cache")
+    if args.paths is not None and args.paths < 1:
+        parser.error("--paths must be a positive integer")
+    stats = SearchStats() if args.stats else None
+    # The landmark index is built over the compact graph
+    compact = args.compact or args.strategy == "landmarks"
+    options = dict(compact=compact, cache=args.cache,
+                   rebuild_cache=args.rebuild_cache, lean=args.lean)
+
+    # Batch output is JSON on stdout, so progress goes to stderr
+    log = sys.stderr if args.batch else sys.stdout
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=log)
+    start = time.perf_counter()
+    source = load_data(args.directory, **options)
+    seconds = time.perf_counter() - start
+    print(f"Data loaded from {source} in {seconds:.2f}s.", file=log)
+    if stats is not None:
+        stats.phases["load"] = seconds
+
+    if args.strategy == "landmarks":
+        start = time.perf_counter()
+        built = load_landmarks(args.directory, args.landmarks,
+                               rebuild=args.rebuild_cache)
+        seconds = time.perf_counter() - start
+        print(f"Landmark index {'built' if built else 'loaded'} "
+              f"in {seconds:.2f}s.", file=log)
+        if stats is not None:
+            stats.phases["landmarks"] = seconds
+
+    if args.batch:
+        if stats is not None:
+            emit_stats({"event": "load", "phases": stats.phases})
+        if args.batch == "-":
+            run_batch(sys.stdin, args.strategy, args.workers,
+                      args.directory, options, args.stats, args.landmarks)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, args.strategy, args.workers,
+                          args.directory, options, args.stats,
+                          args.landmarks)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,49 +285,216 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    
-    path = shortest_path(source, target)
+    if args.paths is not None:
+        print_all_paths(source, target, args.paths)
+        return
+
+    if stats is None:
+        path = STRATEGIES[args.strategy](source, target)
+    else:
+        with stats.phase("search"):
+            path = STRATEGIES[args.strategy](source, target, stats)
 
     if path is None:
         print("Not connected.")
     else:
         degrees = len(path)
         print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(source, path)
+
+    if stats is not None:
+        emit_stats({"event": "query", "strategy": args.strategy,
+                    "source": source, "target": target, **stats.to_dict()})
+
+
+def print_path(source, path):
+    """
+    Prints each step of a (movie_id, person_id) path from the source.
+    """
+    path = [(None, source)] + path
+    for i in range(len(path) - 1):
+        person1 = person_name(path[i][1])
+        person2 = person_name(path[i + 1][1])
+        movie = movie_title(path[i + 1][0])
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
+def print_all_paths(source, target, k):
+    """
+    Prints up to `k` of the shortest paths from the source to the target.
+    """
+    result = all_shortest_paths(source, target, k)
+    if result is None:
+        print("Not connected.")
+        return
+    paths, count, degrees = result
+    print(f"{degrees} degrees of separation, "
+          f"{count} shortest connections; showing {len(paths)}.")
+    for i, path in enumerate(paths):
+        print(f"Connection {i + 1}:")
+        print_path(source, path)
+
+
+def emit_stats(record):
+    """
+    Writes one statistics record to stderr as a JSON line.
+    """
+    print(json.dumps(record), file=sys.stderr)
+
+
+def run_batch(lines, strategy, workers, directory, options, stats=False,
+              landmarks=None):
+    """
+    Answer the query on each of `lines` with `strategy`, printing one
+    JSON object per query in input order, then the throughput to stderr.
+    With `stats`, each answer carries its search statistics.
+
+    With more than one worker, queries are answered by a process pool
+    sharing the already loaded, read-only data; `directory`, `options`
+    and `landmarks` (the landmark count) are only used to load it in
+    workers that don't inherit it.
+    """
+    queries = (line for line in lines if line.strip())
+    count = 0
+    start = time.perf_counter()
+    if workers > 1:
+        with multiprocessing.Pool(
+            workers, initializer=init_worker,
+            initargs=(directory, options, strategy, stats, landmarks)
+        ) as pool:
+            for result in pool.imap(answer_query, queries, chunksize=16):
+                print(result)
+                count += 1
+    else:
+        init_worker(directory, options, strategy, stats, landmarks)
+        for query in queries:
+            print(answer_query(query))
+            count += 1
+    seconds = time.perf_counter() - start
+    rate = count / seconds if seconds > 0 else float("inf")
+    print(f"Answered {count} queries in {seconds:.2f}s "
+          f"({rate:.1f} queries/s).", file=sys.stderr)
+
+
+# Search strategy used by `answer_query` and whether it reports search
+# statistics, set per process by `init_worker`
+batch_strategy = None
+batch_stats = False
+
+
+def init_worker(directory, options, strategy, stats=False, landmarks=None):
+    """
+    Prepare a process to answer batch queries, loading data (and the
+    `landmarks`-landmark index for that strategy) unless it was
+    inherited from the parent process.
+    """
+    global batch_strategy, batch_stats
+    batch_strategy = STRATEGIES[strategy]
+    batch_stats = stats
+    if graph is None and not people:
+        load_data(directory, **options)
+    if strategy == "landmarks" and landmark_index is None:
+        # The parent process has already built and saved the index, so
+        # this only reads it back
+        load_landmarks(directory, landmarks)
+
+
+def answer_query(line):
+    """
+    Answer one batch query: a source and a target, each a name or a
+    person id, separated by a tab (or a comma if there is no tab).
+    Returns the answer as a JSON string.
+    """
+    line = line.rstrip("\n")
+    parts = line.split("\t") if "\t" in line else line.split(",")
+    if len(parts) != 2:
+        return json.dumps({"query": line, "error": "expected two people"})
+
+    result = {"query": line}
+    ends = []
+    for part in parts:
+        person_ids = person_ids_for_query(part.strip())
+        if len(person_ids) != 1:
+            result["error"] = "ambiguous" if person_ids else "not found"
+            result["person"] = part.strip()
+            result["candidates"] = person_ids
+            if not person_ids:
+                result["suggestions"] = get_name_index().suggest(part.strip())
+            return json.dumps(result)
+        ends.append(person_ids[0])
+    source, target = ends
+
+    if batch_stats:
+        stats = SearchStats()
+        with stats.phase("search"):
+            path = batch_strategy(source, target, stats)
+        result["stats"] = stats.to_dict()
+    else:
+        path = batch_strategy(source, target)
+    result["source"] = source
+    result["target"] = target
+    if path is None:
+        result["degrees"] = None
+        result["path"] = None
+    else:
+        result["degrees"] = len(path)
+        result["path"] = [
+            {
+                "movie_id": movie_id,
+                "movie": movie_title(movie_id),
+                "person_id": person_id,
+                "person": person_name(person_id),
+            }
+            for movie_id, person_id in path
+        ]
+    return json.dumps(result)
 
 
-def shortest_path(source, target):
+def person_ids_for_query(query):
+    """
+    Returns the person ids matching `query`, taken as a person id
+    first and as a name otherwise, without prompting.
+    """
+    if graph is not None:
+        if query in graph.person_index:
+            return [query]
+    elif query in people:
+        return [query]
+    return sorted(person_ids_named(query))
+
+
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
+    Search counters are added to `stats` (a `SearchStats`) if given.
 
     If no possible path, returns None.
     """
+    if graph is not None:
+        return graph.path_ids(graph.shortest_path(
+            graph.person_index[source], graph.person_index[target], stats
+        ))
+
     # Initialization
     num_explored = 0
     start = Node(state=source, parent=None, action=None)
-    front = QueueFrontier()
+    front = DequeQueueFrontier()
     front.add(start)
     explored = set()
     solution = None
-    i = 0
 
     while True:
-        print(i)
         if front.empty():
             return None
-        
+
         # Get node from frontier
+        if stats is not None:
+            stats.record(frontier=len(front))
         node = front.remove()
         num_explored+=1
 
         if node.state == target:
-            print('b')
             actions = []
             actors = []
             sol = []
@@ -127,7 +510,10 @@ def shortest_path(source, target):
         
         explored.add(node.state)
 
-        for movie_id, person_id in neighbors_for_person(node.state):
+        neighbors = neighbors_for_person(node.state)
+        if stats is not None:
+            stats.record(expanded=1, generated=len(neighbors))
+        for movie_id, person_id in neighbors:
             if person_id == target:
                 actions = []
                 actors = []
@@ -144,24 +530,252 @@ def shortest_path(source, target):
             if not front.contains_state(person_id) and person_id not in explored:
                 child = Node(state=person_id, parent=node, action=movie_id)
                 front.add(child)
-        i+=1
 
 
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching outward from
+    both people at once and always expanding the smaller frontier.
+    Search counters are added to `stats` (a `SearchStats`) if given.
+
+    If no possible path, returns None.
+    """
+    if graph is not None:
+        return graph.path_ids(graph.bidirectional_shortest_path(
+            graph.person_index[source], graph.person_index[target],
+            stats=stats
+        ))
+
+    if source == target:
+        return []
+
+    # Maps each reached person to the (movie_id, person_id) step
+    # leading back towards the side's starting person
+    forward = {source: None}
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    while forward_layer and backward_layer:
+        # Expand a whole layer of the smaller side
+        if len(forward_layer) <= len(backward_layer):
+            layer, parents, others = forward_layer, forward, backward
+        else:
+            layer, parents, others = backward_layer, backward, forward
+        next_layer = []
+        meeting = None
+        for person_id in layer:
+            neighbors = neighbors_for_person(person_id)
+            if stats is not None:
+                stats.record(expanded=1, generated=len(neighbors))
+            for movie_id, neighbor_id in neighbors:
+                if neighbor_id in parents:
+                    continue
+                parents[neighbor_id] = (movie_id, person_id)
+                next_layer.append(neighbor_id)
+                # Keep the first meeting; any other one in this layer
+                # yields a path of the same length
+                if meeting is None and neighbor_id in others:
+                    meeting = neighbor_id
+        if stats is not None:
+            stats.record(frontier=len(forward_layer) + len(backward_layer))
+        if meeting is not None:
+            return join_paths(forward, backward, meeting)
+        if parents is forward:
+            forward_layer = next_layer
+        else:
+            backward_layer = next_layer
+
+    return None
+
+
+def join_paths(forward, backward, meeting):
+    """
+    Returns the (movie_id, person_id) path through `meeting`, given the
+    parent links of a forward and a backward search.
+    """
+    # Walk back from the meeting person to the source
+    path = []
+    person_id = meeting
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        path.append((movie_id, person_id))
+        person_id = parent_id
+    path.reverse()
+
+    # Walk on from the meeting person to the target
+    person_id = meeting
+    while backward[person_id] is not None:
+        movie_id, person_id = backward[person_id]
+        path.append((movie_id, person_id))
+    return path
+
+
+def landmark_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, using bounds from the
+    landmark index to skip or shorten the search.
+    Search counters are added to `stats` (a `SearchStats`) if given.
+
+    If no possible path, returns None.
+    """
+    if graph is None or landmark_index is None:
+        raise Exception("landmarks strategy needs the compact graph "
+                        "and a loaded landmark index")
+    return graph.path_ids(landmark_index.shortest_path(
+        graph, graph.person_index[source], graph.person_index[target], stats
+    ))
+
+
+def single_source(source):
+    """
+    Runs a BFS from the source over the whole compact graph.
+
+    Returns (distance, parent_person, parent_movie) arrays indexed by
+    `graph.person_index`; see `Graph.single_source`. Use
+    `path_from(source, target, parents)` to read off shortest paths.
+    """
+    if graph is None:
+        raise Exception("single_source needs the compact graph")
+    return graph.single_source(graph.person_index[source])
+
+
+def path_from(source, target, parents):
+    """
+    Returns the (movie_id, person_id) path from the source to the
+    target given the `single_source(source)` result `parents`,
+    or None if they aren't connected.
+    """
+    _, parent_person, parent_movie = parents
+    return graph.path_ids(graph.trace(
+        parent_person, parent_movie,
+        graph.person_index[source], graph.person_index[target]
+    ))
+
+
+def all_shortest_paths(source, target, k=None):
+    """
+    Returns (paths, count, degrees): up to `k` (and at most MAX_PATHS)
+    of the shortest lists of (movie_id, person_id) pairs that connect
+    the source to the target, how many such shortest paths exist, and
+    their length.
+
+    The BFS records every way each person is first reached, layer by
+    layer, so all shortest paths are read off that layered DAG without
+    exploring anyone twice. Paths are generated one at a time, so only
+    the returned ones are ever held in memory.
+
+    If no possible path, returns None.
+    """
+    limit = MAX_PATHS if k is None else min(k, MAX_PATHS)
+    if graph is not None:
+        start = graph.person_index[source]
+        end = graph.person_index[target]
+        dag = shortest_path_dag(start, end, graph.neighbors)
+        if dag is None:
+            return None
+        paths = itertools.islice(dag_paths(dag, start, end), limit)
+        return ([graph.path_ids(path) for path in paths],
+                count_dag_paths(dag, end), dag_degrees(dag, end))
+
+    dag = shortest_path_dag(source, target, neighbors_for_person)
+    if dag is None:
+        return None
+    paths = list(itertools.islice(dag_paths(dag, source, target), limit))
+    return paths, count_dag_paths(dag, target), dag_degrees(dag, target)
+
+
+def shortest_path_dag(source, target, neighbors):
+    """
+    Returns the layered DAG of shortest paths from the source, as a
+    dict mapping each person reached up to the target's layer to the
+    sorted (movie, person) pairs it was reached from in the layer
+    before, using `neighbors` to expand people.
+
+    If no possible path, returns None.
+    """
+    depth = {source: 0}
+    parents = {source: []}
+    layer = [source]
+    degrees = 0
+    while layer and target not in depth:
+        degrees += 1
+        next_layer = []
+        for person in layer:
+            for movie, other in neighbors(person):
+                reached = depth.get(other)
+                if reached is None:
+                    depth[other] = degrees
+                    parents[other] = [(movie, person)]
+                    next_layer.append(other)
+                elif reached == degrees:
+                    parents[other].append((movie, person))
+        layer = next_layer
+    if target not in depth:
+        return None
+    for steps in parents.values():
+        # Repeated star rows can list the same step twice
+        steps[:] = sorted(set(steps))
+    return parents
+
+
+def dag_paths(dag, source, target):
+    """
+    Yields every path from the source to the target in a shortest path
+    DAG, each as a list of (movie, person) pairs.
+    """
+    if target == source:
+        yield []
+        return
+    for movie, parent in dag[target]:
+        for path in dag_paths(dag, source, parent):
+            yield path + [(movie, target)]
+
+
+def dag_degrees(dag, target):
+    """
+    Returns the length of the shortest paths to the target in a
+    shortest path DAG, following any one parent back to the source.
+    """
+    degrees = 0
+    while dag[target]:
+        _, target = dag[target][0]
+        degrees += 1
+    return degrees
+
+
+def count_dag_paths(dag, target):
+    """
+    Returns the number of paths to the target in a shortest path DAG.
+    """
+    counts = dict()
+
+    def count(person):
+        if person not in counts:
+            steps = dag[person]
+            counts[person] = (
+                sum(count(parent) for _, parent in steps) if steps else 1
+            )
+        return counts[person]
+
+    return count(target)
+
 
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = list(person_ids_named(name))
     if len(person_ids) == 0:
-        return None
+        return suggest_person(name)
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
+            name = person_name(person_id)
+            birth = person_birth(person_id)
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
         try:
             person_id = input("Intended Person ID: ")
@@ -174,11 +788,40 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def suggest_person(name):
+    """
+    Offers close matches for a name with no exact match and returns the
+    IMDB id for the chosen one, resolving ambiguities as needed.
+    """
+    candidates = get_name_index().suggest(name, limit=10)
+    if not candidates:
+        return None
+    print(f"No exact match for '{name}'. Did you mean:")
+    for i, candidate in enumerate(candidates):
+        count = len(names[candidate])
+        people_note = f" ({count} people)" if count > 1 else ""
+        # Show the original capitalization of the name
+        display = person_name(next(iter(names[candidate])))
+        print(f"{i + 1}: {display}{people_note}")
+    try:
+        choice = int(input("Intended Name (number): "))
+    except ValueError:
+        return None
+    if 1 <= choice <= len(candidates):
+        return person_id_for_name(candidates[choice - 1])
+    return None
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        return set(graph.path_ids(
+            graph.neighbors(graph.person_index[person_id])
+        ))
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -187,5 +830,13 @@ def neighbors_for_person(person_id):
     return neighbors
 
 
+# Search strategies selectable with --strategy
+STRATEGIES = {
+    "bfs": shortest_path,
+    "bidirectional": bidirectional_shortest_path,
+    "landmarks": landmark_shortest_path,
+}
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,348 @@
+import csv
+from array import array
+
+
+class Graph():
+    """
+    Compact, integer-indexed star graph.
+
+    People and movies are interned to consecutive ints, and each
+    direction of the star relation is stored in CSR form: the movies
+    of person `p` are `person_movies[person_offsets[p]:person_offsets[p + 1]]`
+    and the people of movie `m` are
+    `movie_people[movie_offsets[m]:movie_offsets[m + 1]]`.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles,
+                 person_offsets, person_movies, movie_offsets, movie_people,
+                 person_index=None, movie_index=None):
+        """
+        The id, name, birth and title columns only need to support
+        `len` and indexing. `person_index` and `movie_index` map ids back
+        to indices and default to dicts built from the id columns.
+        """
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+        if person_index is None:
+            person_index = {
+                person_id: i for i, person_id in enumerate(person_ids)
+            }
+        if movie_index is None:
+            movie_index = {
+                movie_id: i for i, movie_id in enumerate(movie_ids)
+            }
+        self.person_index = person_index
+        self.movie_index = movie_index
+        # How indices are assigned: "file" (row order) or "sorted" (by id)
+        self.ordering = "file"
+
+    def person_count(self):
+        return len(self.person_offsets) - 1
+
+    def movie_count(self):
+        return len(self.movie_offsets) - 1
+
+    def movies_of(self, person):
+        """
+        Return the movie indices `person` starred in.
+        """
+        return self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+
+    def people_of(self, movie):
+        """
+        Return the person indices starring in `movie`.
+        """
+        return self.movie_people[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+        ]
+
+    def neighbors(self, person):
+        """
+        Yield (movie, person) index pairs for people who starred
+        with `person`.
+        """
+        for movie in self.movies_of(person):
+            for other in self.people_of(movie):
+                yield movie, other
+
+    def shortest_path(self, source, target, stats=None):
+        """
+        Return the shortest list of (movie, person) index pairs that
+        connect `source` to `target`, or None if they aren't connected.
+        Search counters are added to `stats` if given.
+        """
+        if source == target:
+            return []
+
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        # Parent links double as the explored set; each movie is
+        # expanded at most once since its cast is reached in one go
+        parent_person = array("i", [-1]) * self.person_count()
+        parent_movie = array("i", [-1]) * self.person_count()
+        movie_seen = bytearray(self.movie_count())
+        parent_person[source] = source
+
+        layer = [source]
+        generated = 0
+        while layer:
+            next_layer = []
+            for expanded, person in enumerate(layer, 1):
+                for i in range(person_offsets[person],
+                               person_offsets[person + 1]):
+                    movie = person_movies[i]
+                    if movie_seen[movie]:
+                        continue
+                    movie_seen[movie] = 1
+                    start, end = movie_offsets[movie], movie_offsets[movie + 1]
+                    generated += end - start
+                    for j in range(start, end):
+                        other = movie_people[j]
+                        if parent_person[other] != -1:
+                            continue
+                        parent_person[other] = person
+                        parent_movie[other] = movie
+                        if other == target:
+                            if stats is not None:
+                                stats.record(expanded, len(layer), generated)
+                            return self.trace(
+                                parent_person, parent_movie, source, target
+                            )
+                        next_layer.append(other)
+            if stats is not None:
+                stats.record(len(layer), len(layer), generated)
+            generated = 0
+            layer = next_layer
+
+        return None
+
+    def single_source(self, source):
+        """
+        Run a BFS from `source` over the whole graph.
+
+        Return (distance, parent_person, parent_movie) arrays indexed by
+        person: the number of degrees from `source` (-1 if unreachable),
+        and the person and movie each person was first reached through.
+        Paths to any person can then be read off with `trace`.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+
+        distance = array("i", [-1]) * self.person_count()
+        parent_person = array("i", [-1]) * self.person_count()
+        parent_movie = array("i", [-1]) * self.person_count()
+        movie_seen = bytearray(self.movie_count())
+        distance[source] = 0
+        parent_person[source] = source
+
+        layer = [source]
+        depth = 0
+        while layer:
+            depth += 1
+            next_layer = []
+            for person in layer:
+                for i in range(person_offsets[person],
+                               person_offsets[person + 1]):
+                    movie = person_movies[i]
+                    if movie_seen[movie]:
+                        continue
+                    movie_seen[movie] = 1
+                    for j in range(movie_offsets[movie],
+                                   movie_offsets[movie + 1]):
+                        other = movie_people[j]
+                        if distance[other] != -1:
+                            continue
+                        distance[other] = depth
+                        parent_person[other] = person
+                        parent_movie[other] = movie
+                        next_layer.append(other)
+            layer = next_layer
+
+        return distance, parent_person, parent_movie
+
+    def trace(self, parent_person, parent_movie, source, target):
+        """
+        Return the (movie, person) index path from `source` to `target`
+        given the parent arrays of a search from `source`,
+        or None if `target` was not reached.
+        """
+        if parent_person[target] == -1:
+            return None
+        path = []
+        person = target
+        while person != source:
+            path.append((parent_movie[person], person))
+            person = parent_person[person]
+        path.reverse()
+        return path
+
+    def bidirectional_shortest_path(self, source, target, limit=None,
+                                    stats=None):
+        """
+        Like `shortest_path`, but searching from both ends and always
+        expanding the smaller frontier.
+        With `limit`, only look for paths of at most `limit` degrees.
+        """
+        if source == target:
+            return []
+
+        forward = {source: None}
+        backward = {target: None}
+        forward_movies = set()
+        backward_movies = set()
+        forward_layer = [source]
+        backward_layer = [target]
+        # Degrees covered by both sides so far; a meeting while expanding
+        # the next layer makes a path of `depth + 1` degrees
+        depth = 0
+
+        while forward_layer and backward_layer:
+            if limit is not None and depth + 1 > limit:
+                return None
+            depth += 1
+            if len(forward_layer) <= len(backward_layer):
+                layer, parents, others, seen = (
+                    forward_layer, forward, backward, forward_movies
+                )
+            else:
+                layer, parents, others, seen = (
+                    backward_layer, backward, forward, backward_movies
+                )
+            next_layer = []
+            meeting = None
+            generated = 0
+            for person in layer:
+                for movie in self.movies_of(person):
+                    if movie in seen:
+                        continue
+                    seen.add(movie)
+                    cast = self.people_of(movie)
+                    generated += len(cast)
+                    for other in cast:
+                        if other in parents:
+                            continue
+                        parents[other] = (movie, person)
+                        next_layer.append(other)
+                        if meeting is None and other in others:
+                            meeting = other
+            if stats is not None:
+                stats.record(len(layer),
+                             len(forward_layer) + len(backward_layer),
+                             generated)
+            if meeting is not None:
+                return self._join(forward, backward, meeting)
+            if parents is forward:
+                forward_layer = next_layer
+            else:
+                backward_layer = next_layer
+
+        return None
+
+    def path_ids(self, path):
+        """
+        Map a list of (movie, person) index pairs back to
+        (movie_id, person_id) pairs.
+        """
+        if path is None:
+            return None
+        return [
+            (self.movie_ids[movie], self.person_ids[person])
+            for movie, person in path
+        ]
+
+    def _join(self, forward, backward, meeting):
+        path = []
+        person = meeting
+        while forward[person] is not None:
+            movie, parent = forward[person]
+            path.append((movie, person))
+            person = parent
+        path.reverse()
+        person = meeting
+        while backward[person] is not None:
+            movie, person = backward[person]
+            path.append((movie, person))
+        return path
+
+
+def build_csr(count, keys, values):
+    """
+    Group `values` by `keys` (ints below `count`) into CSR form.
+    Return (offsets, grouped values) arrays.
+    """
+    offsets = array("i", [0]) * (count + 1)
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    grouped = array("i", [0]) * len(values)
+    position = offsets[:-1]
+    for key, value in zip(keys, values):
+        grouped[position[key]] = value
+        position[key] += 1
+    return offsets, grouped
+
+
+def load_graph(directory):
+    """
+    Load the CSV files in `directory` into a compact `Graph`.
+    """
+    person_ids = []
+    person_names = []
+    person_births = []
+    person_index = dict()
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            person_index[row["id"]] = len(person_ids)
+            person_ids.append(row["id"])
+            person_names.append(row["name"])
+            person_births.append(row["birth"])
+
+    movie_ids = []
+    movie_titles = []
+    movie_index = dict()
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            movie_index[row["id"]] = len(movie_ids)
+            movie_ids.append(row["id"])
+            movie_titles.append(row["title"])
+
+    # Star pairs as parallel int arrays, skipping unknown ids
+    star_people = array("i")
+    star_movies = array("i")
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            person = person_index.get(row["person_id"])
+            movie = movie_index.get(row["movie_id"])
+            if person is None or movie is None:
+                continue
+            star_people.append(person)
+            star_movies.append(movie)
+
+    person_offsets, person_movies = build_csr(
+        len(person_ids), star_people, star_movies
+    )
+    movie_offsets, movie_people = build_csr(
+        len(movie_ids), star_movies, star_people
+    )
+    return Graph(person_ids, person_names, person_births,
+                 movie_ids, movie_titles,
+                 person_offsets, person_movies, movie_offsets, movie_people)
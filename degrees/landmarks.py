@@ -0,0 +1,217 @@
+"""
+Landmark distance index for the compact `Graph`.
+
+The index holds a full BFS tree (distances and parents) from each of K
+high-degree people ("landmarks"). By the triangle inequality, for every
+landmark L
+
+    |d(L, s) - d(L, t)| <= d(s, t) <= d(s, L) + d(L, t)
+
+so the index proves pairs disconnected without searching, answers pairs
+whose bounds meet straight from the trees, and otherwise caps the depth
+of the bidirectional search at one less than the best upper bound,
+skipping its last (and largest) layer whenever the landmark route is
+already shortest.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+from snapshot import source_signature
+
+INDEX_NAME = ".degrees-landmarks"
+INDEX_VERSION = 2
+MAGIC = b"DEGLMRK\0"
+
+
+class LandmarkIndex():
+
+    def __init__(self, landmarks, trees):
+        """
+        `landmarks` is a list of person indices and `trees` a matching
+        list of (distance, parent_person, parent_movie) arrays as returned
+        by `Graph.single_source`.
+        """
+        self.landmarks = landmarks
+        self.trees = trees
+
+    def bounds(self, source, target):
+        """
+        Return (lower, upper, landmark) bounds on the degrees between
+        `source` and `target`, where `upper` is reached through the
+        position `landmark` of the landmark list. `upper` and `landmark`
+        are None if no landmark reaches both people, and `lower` is None
+        if the index shows they aren't connected.
+        """
+        lower = 0
+        upper = None
+        best = None
+        for i, (distance, _, _) in enumerate(self.trees):
+            a, b = distance[source], distance[target]
+            if (a == -1) != (b == -1):
+                return None, None, None
+            if a == -1:
+                continue
+            if abs(a - b) > lower:
+                lower = abs(a - b)
+            if upper is None or a + b < upper:
+                upper = a + b
+                best = i
+        return lower, upper, best
+
+    def shortest_path(self, graph, source, target, stats=None):
+        """
+        Return the shortest list of (movie, person) index pairs that
+        connect `source` to `target`, or None if they aren't connected.
+        Search counters are added to `stats` if given.
+        """
+        lower, upper, landmark = self.bounds(source, target)
+        if lower is None:
+            return None
+        if source == target:
+            return []
+        if upper is not None and lower == upper:
+            return self.route(graph, landmark, source, target)
+
+        # Only a strictly shorter path than the landmark route is news
+        limit = None if upper is None else upper - 1
+        path = graph.bidirectional_shortest_path(source, target, limit, stats)
+        if path is None and upper is not None:
+            return self.route(graph, landmark, source, target)
+        return path
+
+    def route(self, graph, landmark, source, target):
+        """
+        Return the (movie, person) path from `source` through the
+        landmark at position `landmark` to `target`.
+        """
+        _, parent_person, parent_movie = self.trees[landmark]
+        root = self.landmarks[landmark]
+
+        # The tree path runs landmark -> source, so walk it backwards
+        path = []
+        person = source
+        while person != root:
+            movie = parent_movie[person]
+            person = parent_person[person]
+            path.append((movie, person))
+        return path + graph.trace(parent_person, parent_movie, root, target)
+
+
+def select_landmarks(graph, k):
+    """
+    Return the `k` people with the most co-star slots, i.e. the sum of
+    the cast sizes of their movies.
+    """
+    degree = [0] * graph.person_count()
+    for movie in range(graph.movie_count()):
+        cast = graph.people_of(movie)
+        for person in cast:
+            degree[person] += len(cast)
+    return sorted(range(len(degree)), key=lambda p: -degree[p])[:k]
+
+
+def build_index(graph, k):
+    """
+    Build a `LandmarkIndex` over `k` high-degree landmarks of `graph`.
+    """
+    landmarks = select_landmarks(graph, k)
+    trees = [graph.single_source(landmark) for landmark in landmarks]
+    return LandmarkIndex(landmarks, trees)
+
+
+def index_path(directory):
+    return os.path.join(directory, INDEX_NAME)
+
+
+def write_index(index, graph, path, signature):
+    """
+    Write `index` to `path`, keyed to the source CSV `signature`.
+    """
+    header = json.dumps({
+        "version": INDEX_VERSION,
+        "byteorder": sys.byteorder,
+        "itemsize": struct.calcsize("i"),
+        "sources": signature,
+        "people": graph.person_count(),
+        "ordering": graph.ordering,
+        "landmarks": [graph.person_ids[p] for p in index.landmarks],
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for tree in index.trees:
+            for column in tree:
+                f.write(column.tobytes())
+    os.replace(temporary, path)
+
+
+def read_index(graph, path, signature, k):
+    """
+    Memory-map the index at `path` and return it as a `LandmarkIndex`.
+    Return None if it is missing, has fewer than `k` landmarks, or
+    doesn't match this version, platform or the source CSVs.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        try:
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length))
+        except (struct.error, ValueError):
+            return None
+        if (header.get("version") != INDEX_VERSION or
+                header.get("byteorder") != sys.byteorder or
+                header.get("itemsize") != struct.calcsize("i") or
+                header.get("sources") != signature or
+                header.get("people") != graph.person_count() or
+                header.get("ordering") != graph.ordering or
+                len(header.get("landmarks", [])) < k):
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(data)
+    start = len(MAGIC) + 4 + length
+    size = graph.person_count() * struct.calcsize("i")
+    landmarks = []
+    trees = []
+    for i, person_id in enumerate(header["landmarks"][:k]):
+        landmarks.append(graph.person_index[person_id])
+        trees.append(tuple(
+            view[start + j * size:start + (j + 1) * size].cast("i")
+            for j in range(3 * i, 3 * i + 3)
+        ))
+    index = LandmarkIndex(landmarks, trees)
+    index.data = data
+    return index
+
+
+def load_index(graph, directory, k, rebuild=False):
+    """
+    Load the landmark index for `directory`, building and saving it if
+    it is missing, stale, smaller than `k`, or `rebuild` is set.
+    Return (index, built).
+    """
+    path = index_path(directory)
+    signature = source_signature(directory)
+    if not rebuild:
+        index = read_index(graph, path, signature, k)
+        if index is not None:
+            return index, False
+
+    index = build_index(graph, k)
+    try:
+        write_index(index, graph, path, signature)
+    except OSError as e:
+        print(f"Could not write landmark index {path}: {e}", file=sys.stderr)
+    return index, True
@@ -0,0 +1,246 @@
+"""
+Lean, streaming loader for the compact `Graph`.
+
+Only the CSR adjacency stays in memory. People and movies are known by
+a sorted array of their numeric ids (an id's index is its rank), plus
+the byte offset of its row in people.csv or movies.csv, so names,
+births and titles are read back from the files only when a path is
+printed. stars.csv is streamed in chunks straight into int arrays.
+Exact name lookups go through a sorted array of name hashes; names are
+only gathered from people.csv if a fuzzy lookup needs them all.
+"""
+import bisect
+import csv
+import zlib
+from array import array
+
+from graph import Graph, build_csr
+
+# Bytes of stars.csv parsed per chunk
+CHUNK_BYTES = 1 << 20
+
+
+class SortedIds():
+    """
+    Id column of a lean graph: index `i` holds the `i`th smallest id.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        return str(self.ids[i])
+
+    def __iter__(self):
+        return (str(i) for i in self.ids)
+
+
+class SortedIdIndex():
+    """
+    Maps ids to their index in a `SortedIds` column by binary search.
+    """
+
+    def __init__(self, ids):
+        self.ids = ids
+
+    def find(self, value):
+        """
+        Return the index of numeric id `value`, or None.
+        """
+        i = bisect.bisect_left(self.ids, value)
+        if i < len(self.ids) and self.ids[i] == value:
+            return i
+        return None
+
+    def get(self, key, default=None):
+        try:
+            i = self.find(int(key))
+        except ValueError:
+            return default
+        return default if i is None else i
+
+    def __getitem__(self, key):
+        i = self.get(key)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+class CsvColumn():
+    """
+    One field of a CSV file, read from disk by row byte offset on access.
+    """
+
+    def __init__(self, path, offsets, field):
+        self.path = path
+        self.offsets = offsets
+        self.field = field
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, i):
+        # Open per lookup so processes sharing the graph never share
+        # a file position
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[i])
+            line = f.readline().decode("utf-8")
+        return next(csv.reader([line]))[self.field]
+
+
+def first_field(line):
+    """
+    Return the first field of a raw CSV line as an int.
+    """
+    return int(line.split(b",", 1)[0].strip().strip(b'"'))
+
+
+def second_field(line):
+    """
+    Return the second field of a raw CSV line as a string.
+    """
+    rest = line.split(b",", 1)[1]
+    if b'"' not in rest:
+        return rest.split(b",", 1)[0].decode("utf-8")
+    if rest.startswith(b'"') and rest.count(b'"') == 2:
+        return rest[1:rest.index(b'"', 1)].decode("utf-8")
+    # Escaped quotes: leave them to the csv module
+    return next(csv.reader([line.decode("utf-8")]))[1]
+
+
+def name_hash(name):
+    """
+    Return a hash of `name` ignoring case, stable across processes.
+    """
+    return zlib.crc32(name.lower().encode("utf-8"))
+
+
+def scan_ids(path, hash_names=False):
+    """
+    Stream the CSV at `path` and return (ids, offsets, hashes) arrays
+    with each row's numeric id, byte offset and, with `hash_names`, the
+    `name_hash` of its second field (otherwise `hashes` is empty),
+    sorted by id.
+    """
+    ids = array("q")
+    offsets = array("q")
+    hashes = array("I")
+    with open(path, "rb") as f:
+        offset = len(f.readline())
+        for line in f:
+            if line.strip():
+                ids.append(first_field(line))
+                offsets.append(offset)
+                if hash_names:
+                    hashes.append(name_hash(second_field(line)))
+            offset += len(line)
+
+    if any(a > b for a, b in zip(ids, ids[1:])):
+        order = sorted(range(len(ids)), key=ids.__getitem__)
+        ids = array("q", (ids[i] for i in order))
+        offsets = array("q", (offsets[i] for i in order))
+        if hash_names:
+            hashes = array("I", (hashes[i] for i in order))
+    return ids, offsets, hashes
+
+
+class NameLookup():
+    """
+    Finds people by name, ignoring case, from the `name_hash` of every
+    name sorted alongside the person's index. Rows whose hash matches
+    are read back to rule out collisions.
+    """
+
+    def __init__(self, hashes, names):
+        order = sorted(range(len(hashes)), key=hashes.__getitem__)
+        self.hashes = array("I", (hashes[i] for i in order))
+        self.people = array("i", order)
+        # Column of names to check matches against
+        self.names = names
+
+    def find(self, name):
+        """
+        Return the indices of the people named `name`, ignoring case.
+        """
+        name = name.lower()
+        key = name_hash(name)
+        matches = []
+        i = bisect.bisect_left(self.hashes, key)
+        while i < len(self.hashes) and self.hashes[i] == key:
+            person = self.people[i]
+            if self.names[person].lower() == name:
+                matches.append(person)
+            i += 1
+        return matches
+
+
+def load_lean_graph(directory):
+    """
+    Load the CSV files in `directory` into a `Graph` holding only the
+    adjacency, with lazily read names, births and titles, and a
+    `NameLookup` as its `name_lookup`.
+    """
+    people_path = f"{directory}/people.csv"
+    movies_path = f"{directory}/movies.csv"
+    person_ids, person_rows, name_hashes = scan_ids(people_path,
+                                                    hash_names=True)
+    movie_ids, movie_rows, _ = scan_ids(movies_path)
+    person_index = SortedIdIndex(person_ids)
+    movie_index = SortedIdIndex(movie_ids)
+
+    star_people = array("i")
+    star_movies = array("i")
+    with open(f"{directory}/stars.csv", "rb") as f:
+        f.readline()
+        while True:
+            lines = f.readlines(CHUNK_BYTES)
+            if not lines:
+                break
+            for line in lines:
+                fields = line.split(b",")
+                if len(fields) < 2:
+                    continue
+                person = person_index.find(int(fields[0].strip().strip(b'"')))
+                movie = movie_index.find(int(fields[1].strip().strip(b'"')))
+                if person is None or movie is None:
+                    continue
+                star_people.append(person)
+                star_movies.append(movie)
+
+    person_offsets, person_movies = build_csr(
+        len(person_ids), star_people, star_movies
+    )
+    movie_offsets, movie_people = build_csr(
+        len(movie_ids), star_movies, star_people
+    )
+    graph = Graph(SortedIds(person_ids),
+                  CsvColumn(people_path, person_rows, 1),
+                  CsvColumn(people_path, person_rows, 2),
+                  SortedIds(movie_ids),
+                  CsvColumn(movies_path, movie_rows, 1),
+                  person_offsets, person_movies, movie_offsets, movie_people,
+                  person_index=person_index, movie_index=movie_index)
+    graph.ordering = "sorted"
+    graph.name_lookup = NameLookup(name_hashes, graph.person_names)
+    return graph
+
+
+def people_names(directory):
+    """
+    Stream people.csv in `directory` and return a dictionary from each
+    lowercase name to the set of ids of people with that name.
+    """
+    names = dict()
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            names.setdefault(row["name"].lower(), set()).add(
+                str(int(row["id"]))
+            )
+    return names
@@ -0,0 +1,143 @@
+"""
+Prefix and fuzzy lookup over person names.
+
+Prefix matches come from a sorted array of names searched with bisect,
+which answers the same queries as a trie walk without a dict per
+character. Fuzzy matches come from a trigram inverted index, ranked by
+the Dice coefficient between the query's and each name's trigrams.
+"""
+import bisect
+import heapq
+from array import array
+from collections import Counter
+
+# Postings processed per fuzzy query, rarest trigrams first, so common
+# trigrams like " jo" can't make a lookup scan most of the index
+FUZZY_BUDGET = 2000
+
+# Candidates per fuzzy query whose trigrams are compared with the
+# query's in full to score them exactly
+FUZZY_RESCORE = 50
+
+# Prefix matches ranked per query; very short prefixes only rank the
+# first ones in alphabetical order
+PREFIX_BUDGET = 2000
+
+
+def trigrams(text):
+    """
+    Return the set of trigrams of `text`, padded so word starts and
+    ends count as well.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def shared_trigrams(grams, text):
+    """
+    Return how many of the trigrams `grams` are trigrams of `text`.
+    """
+    # A trigram is one of `text`'s iff it occurs in the padded text,
+    # which is quicker to test than building its trigrams
+    padded = f"  {text} "
+    return len([gram for gram in grams if gram in padded])
+
+
+class NameIndex():
+
+    def __init__(self, names, weights=None):
+        """
+        Index the (lowercase) `names`. `weights` optionally maps a name
+        to a popularity score used to rank prefix matches and break ties.
+        """
+        self.names = sorted(names)
+        weights = weights or dict()
+        # Position of each name when ranked most popular, then shortest
+        # first, so ranking a match is a single int lookup
+        order = sorted(
+            range(len(self.names)),
+            key=lambda i: (-weights.get(self.names[i], 0),
+                           len(self.names[i]), i)
+        )
+        self.rank = array("i", [0]) * len(order)
+        for position, i in enumerate(order):
+            self.rank[i] = position
+        self.sizes = array("i")
+        postings = dict()
+        for i, name in enumerate(self.names):
+            grams = trigrams(name)
+            self.sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, array("i")).append(i)
+        self.postings = postings
+
+    def prefix(self, query, limit=10):
+        """
+        Return up to `limit` names starting with `query`, most popular
+        first, then shortest.
+        """
+        query = query.lower()
+        start = bisect.bisect_left(self.names, query)
+        # Every name sharing the prefix sorts before query + U+10FFFF
+        end = bisect.bisect_left(self.names, query + "\U0010ffff", start)
+        matches = range(start, min(end, start + PREFIX_BUDGET))
+        best = heapq.nsmallest(limit, matches, key=self.rank.__getitem__)
+        return [self.names[i] for i in best]
+
+    def fuzzy(self, query, limit=10):
+        """
+        Return up to `limit` (name, score) pairs for names sharing
+        trigrams with `query`, best first. Scores are Dice coefficients
+        between 0 and 1.
+
+        Candidates come from the posting lists of the query's rarest
+        trigrams, reading at most FUZZY_BUDGET postings in all (a list
+        too long for what is left of the budget is cut short). The
+        FUZZY_RESCORE candidates sharing the most of those trigrams are
+        then scored on all of their trigrams.
+        """
+        grams = trigrams(query.lower())
+        lists = sorted(
+            (self.postings[gram] for gram in grams if gram in self.postings),
+            key=len
+        )
+        shared = Counter()
+        budget = FUZZY_BUDGET
+        for posting in lists:
+            if budget <= 0:
+                break
+            if len(posting) > budget:
+                posting = posting[:budget]
+            budget -= len(posting)
+            shared.update(posting)
+
+        # Sorting in C beats most_common's heap for a few thousand names
+        candidates = sorted(shared, key=shared.__getitem__,
+                            reverse=True)[:FUZZY_RESCORE]
+        size = len(grams)
+        sizes = self.sizes
+        rank = self.rank
+        best = heapq.nsmallest(
+            limit,
+            ((name, shared_trigrams(grams, self.names[name]))
+             for name in candidates),
+            key=lambda item: (-item[1] / (size + sizes[item[0]]),
+                              rank[item[0]])
+        )
+        return [
+            (self.names[name], 2 * count / (size + sizes[name]))
+            for name, count in best
+        ]
+
+    def suggest(self, query, limit=10):
+        """
+        Return up to `limit` candidate names for `query`: prefix matches
+        first, then fuzzy matches.
+        """
+        candidates = self.prefix(query, limit)
+        for name, _ in self.fuzzy(query, limit):
+            if len(candidates) >= limit:
+                break
+            if name not in candidates:
+                candidates.append(name)
+        return candidates
@@ -0,0 +1,142 @@
+"""
+Versioned binary snapshots of a compact `Graph`.
+
+A snapshot stores the CSR arrays as raw native ints and the id, name
+and title columns as NUL-separated UTF-8 blobs, behind a small JSON
+header. Loading memory-maps the file, so the arrays are paged in on
+demand instead of being parsed. The header records the mtime and size
+of each source CSV and the snapshot is ignored once any of them change.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+
+from graph import Graph, load_graph
+
+SNAPSHOT_NAME = ".degrees-snapshot"
+SNAPSHOT_VERSION = 1
+MAGIC = b"DEGSNAP\0"
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Graph attributes stored as int arrays and as string columns
+ARRAYS = ["person_offsets", "person_movies", "movie_offsets", "movie_people"]
+STRINGS = ["person_ids", "person_names", "person_births",
+           "movie_ids", "movie_titles"]
+
+
+def snapshot_path(directory):
+    return os.path.join(directory, SNAPSHOT_NAME)
+
+
+def source_signature(directory):
+    """
+    Return the (mtime_ns, size) of each source CSV in `directory`.
+    """
+    signature = dict()
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        signature[name] = [stat.st_mtime_ns, stat.st_size]
+    return signature
+
+
+def write_snapshot(graph, path, signature):
+    """
+    Write `graph` to a snapshot file at `path`.
+    """
+    sections = dict()
+    blobs = []
+    offset = 0
+    for name in ARRAYS + STRINGS:
+        column = getattr(graph, name)
+        if name in ARRAYS:
+            blob = column.tobytes()
+        else:
+            blob = "\0".join(column).encode("utf-8")
+        sections[name] = [offset, len(blob), len(column)]
+        # Keep every section aligned for the int casts
+        padding = -len(blob) % 8
+        blobs.append(blob + b"\0" * padding)
+        offset += len(blob) + padding
+
+    header = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "byteorder": sys.byteorder,
+        "itemsize": struct.calcsize("i"),
+        "sources": signature,
+        "sections": sections,
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    # Write to a temporary file first so readers never see half a snapshot
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temporary, path)
+
+
+def read_snapshot(path, signature):
+    """
+    Memory-map the snapshot at `path` and return it as a `Graph`.
+    Return None if there is no snapshot, or if it is from another
+    version or platform or its source CSVs have changed since.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return None
+        try:
+            (length,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(length))
+        except (struct.error, ValueError):
+            return None
+        if (header.get("version") != SNAPSHOT_VERSION or
+                header.get("byteorder") != sys.byteorder or
+                header.get("itemsize") != struct.calcsize("i") or
+                header.get("sources") != signature):
+            return None
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    start = len(MAGIC) + 4 + length
+    view = memoryview(data)
+    columns = dict()
+    for name, (offset, size, count) in header["sections"].items():
+        section = view[start + offset:start + offset + size]
+        if name in ARRAYS:
+            columns[name] = section.cast("i")
+        else:
+            columns[name] = str(section, "utf-8").split("\0") if count else []
+    graph = Graph(**columns)
+    # The arrays are views into the map, so keep it alive with the graph
+    graph.snapshot = data
+    return graph
+
+
+def load_cached_graph(directory, rebuild=False):
+    """
+    Load the compact `Graph` for `directory` from its snapshot,
+    building the snapshot from the CSV files if it is missing, stale,
+    or `rebuild` is set.
+    Return (graph, built) where `built` tells whether the CSVs were parsed.
+    """
+    path = snapshot_path(directory)
+    signature = source_signature(directory)
+    if not rebuild:
+        graph = read_snapshot(path, signature)
+        if graph is not None:
+            return graph, False
+
+    graph = load_graph(directory)
+    try:
+        write_snapshot(graph, path, signature)
+    except OSError as e:
+        print(f"Could not write snapshot {path}: {e}", file=sys.stderr)
+    return graph, True
@@ -1,3 +1,8 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -36,3 +41,91 @@ class QueueFrontier(StackFrontier):
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
             return node
+
+
+class DequeStackFrontier():
+    """
+    Stack frontier with O(1) add/remove and hashed `contains_state`.
+
+    Same API as `StackFrontier`, but nodes live in a deque and a parallel
+    count of states is kept so membership tests don't scan the frontier.
+    """
+
+    def __init__(self):
+        self.frontier = deque()
+        self.states = dict()
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def __len__(self):
+        return len(self.frontier)
+
+    def _pop(self):
+        return self.frontier.pop()
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self._pop()
+            # Forget the state once its last copy leaves the frontier
+            count = self.states[node.state] - 1
+            if count == 0:
+                del self.states[node.state]
+            else:
+                self.states[node.state] = count
+            return node
+
+
+class DequeQueueFrontier(DequeStackFrontier):
+
+    def _pop(self):
+        return self.frontier.popleft()
+
+
+class SearchStats():
+    """
+    Counters and per-phase wall times filled in by a search when passed
+    as its `stats` argument.
+    """
+
+    def __init__(self):
+        self.nodes_expanded = 0
+        self.frontier_peak = 0
+        self.neighbors_generated = 0
+        # Maps phase name to seconds spent in it
+        self.phases = dict()
+
+    def record(self, expanded=0, frontier=0, generated=0):
+        self.nodes_expanded += expanded
+        self.neighbors_generated += generated
+        if frontier > self.frontier_peak:
+            self.frontier_peak = frontier
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time the body of a `with` block as phase `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = (self.phases.get(name, 0) +
+                                 time.perf_counter() - start)
+
+    def to_dict(self):
+        return {
+            "nodes_expanded": self.nodes_expanded,
+            "frontier_peak": self.frontier_peak,
+            "neighbors_generated": self.neighbors_generated,
+            "phases": dict(self.phases),
+        }
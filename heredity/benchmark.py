@@ -0,0 +1,340 @@
+"""
+Benchmarks for the heredity project.
+
+Usage: python benchmark.py <benchmark> [options]
+Run `python benchmark.py -h` for the list of benchmarks.
+"""
+import argparse
+import os
+import random
+import time
+import tracemalloc
+
+import heredity
+from elimination import eliminate_probabilities
+from parallel import parallel_probabilities
+from sampling import gibbs_sampling, likelihood_weighting
+from vectorized import Evaluator, assignments, vectorized_probabilities
+
+FAMILIES = ["data/family0.csv", "data/family1.csv", "data/family2.csv"]
+
+ENGINES = {
+    "enumerate": heredity.enumerate_probabilities,
+    "stream": heredity.stream_probabilities,
+    "vectorized": vectorized_probabilities,
+    "elimination": eliminate_probabilities,
+}
+
+
+def timed(function, *args):
+    """
+    Return (result, seconds) for calling `function(*args)`.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def max_difference(a, b):
+    """
+    Return the largest difference between two probability tables.
+    """
+    return max(
+        abs(a[person][field][value] - b[person][field][value])
+        for person in a
+        for field in a[person]
+        for value in a[person][field]
+    )
+
+
+def synthetic_family(people, seed=0, known=0.5):
+    """
+    Return a family of `people` people in `load_data` format: couples of
+    earlier people have children, with about a `known` share of traits
+    known.
+    """
+    rng = random.Random(seed)
+    family = dict()
+    for i in range(people):
+        name = f"Person{i}"
+        # The first two are founders; later people are founders a
+        # third of the time, so new couples keep joining
+        if i >= 2 and rng.random() < 2 / 3:
+            mother, father = rng.sample(sorted(family), 2)
+        else:
+            mother = father = None
+        trait = None
+        if rng.random() < known:
+            trait = rng.random() < 0.3
+        family[name] = {"name": name, "mother": mother, "father": father,
+                        "trait": trait}
+    return family
+
+
+def tree_family(people, seed=0, known=0.5):
+    """
+    Return a tree-like family of `people` people in `load_data` format:
+    every couple is someone already in the family and a new founder,
+    so the pedigree has no loops, and children are added to couples at
+    random, with about a `known` share of traits known.
+    """
+    rng = random.Random(seed)
+    family = dict()
+    couples = []
+
+    def add(mother=None, father=None):
+        name = f"Person{len(family)}"
+        trait = None
+        if rng.random() < known:
+            trait = rng.random() < 0.3
+        family[name] = {"name": name, "mother": mother, "father": father,
+                        "trait": trait}
+        return name
+
+    add()
+    while len(family) < people:
+        # A new couple needs room for the founder and their child
+        room = len(family) + 2 <= people
+        if couples and (not room or rng.random() < 0.5):
+            mother, father = rng.choice(couples)
+        elif room:
+            mother, father = rng.choice(list(family)), add()
+            couples.append((mother, father))
+        else:
+            add()
+            continue
+        add(mother, father)
+    return family
+
+
+def decode(names, genes, traits):
+    """
+    Return the (one_gene, two_genes, have_trait) sets of an encoded
+    assignment.
+    """
+    one_gene = {name for name, g in zip(names, genes) if g == 1}
+    two_genes = {name for name, g in zip(names, genes) if g == 2}
+    have_trait = {name for name, t in zip(names, traits) if t}
+    return one_gene, two_genes, have_trait
+
+
+def joint_mismatches(people):
+    """
+    Return (assignments, mismatches): how many assignments consistent
+    with the evidence there are, and how many of them get a joint
+    probability from the vectorized evaluator that is not bit-for-bit
+    the one `joint_probability` returns.
+    """
+    evaluator = Evaluator(people)
+    count = 0
+    mismatches = 0
+    for genes, traits in assignments(people):
+        joint = evaluator.joint_probabilities(genes, traits)
+        for row in range(len(genes)):
+            expected = heredity.joint_probability(
+                people, *decode(evaluator.names, genes[row], traits[row])
+            )
+            mismatches += joint[row] != expected
+        count += len(genes)
+    return count, mismatches
+
+
+def bench_engines(args):
+    """
+    Time every inference engine on family files, with the largest
+    difference from plain enumeration and the peak memory traced.
+    """
+    print(f"{'family':<20} {'people':>6} {'engine':<12} {'seconds':>9} "
+          f"{'peak KiB':>9} {'max diff':>10}")
+    for filename in args.families:
+        people = heredity.load_data(filename)
+        exact = None
+        for name, engine in ENGINES.items():
+            tracemalloc.start()
+            probabilities, seconds = timed(engine, people)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            if exact is None:
+                exact = probabilities
+            print(f"{filename:<20} {len(people):>6} {name:<12} "
+                  f"{seconds:>9.4f} {peak / 1024:>9.1f} "
+                  f"{max_difference(exact, probabilities):>10.2e}")
+
+
+def bench_joint(args):
+    """
+    Compare the time per joint probability of the scalar and vectorized
+    paths over every assignment of a family, and count the joints that
+    differ at all.
+    """
+    print(f"{'family':<20} {'assigns':>8} {'mismatch':>8} {'scalar us':>10} "
+          f"{'vector us':>10} {'speedup':>8}")
+    for filename in args.families:
+        people = heredity.load_data(filename)
+        evaluator = Evaluator(people)
+        batches = list(assignments(people))
+        decoded = [
+            decode(evaluator.names, genes[row], traits[row])
+            for genes, traits in batches
+            for row in range(len(genes))
+        ]
+        _, scalar_seconds = timed(lambda: [
+            heredity.joint_probability(people, *sets) for sets in decoded
+        ])
+        _, vector_seconds = timed(lambda: [
+            evaluator.joint_probabilities(genes, traits)
+            for genes, traits in batches
+        ])
+        count, mismatches = joint_mismatches(people)
+        print(f"{filename:<20} {count:>8} {mismatches:>8} "
+              f"{scalar_seconds / count * 1e6:>10.2f} "
+              f"{vector_seconds / count * 1e6:>10.3f} "
+              f"{scalar_seconds / vector_seconds:>8.1f}")
+
+
+def bench_underflow(args):
+    """
+    Show elimination on tree-like families where everyone has the
+    trait, underflowing to 0 without log space once the family is big
+    enough. Unrelated people wouldn't do, as each unconnected part of
+    a family is calibrated on its own.
+    """
+    print(f"{'people':>6} {'linear s':>9} {'log s':>9} "
+          f"{'linear P(1 gene)':>17} {'log P(1 gene)':>14}")
+    for count in args.people:
+        people = tree_family(count)
+        for person in people.values():
+            person["trait"] = True
+        linear, linear_seconds = timed(eliminate_probabilities, people)
+        logged, log_seconds = timed(
+            lambda: eliminate_probabilities(people, log_space=True)
+        )
+        print(f"{len(people):>6} {linear_seconds:>9.3f} {log_seconds:>9.3f} "
+              f"{linear['Person1']['gene'][1]:>17.4f} "
+              f"{logged['Person1']['gene'][1]:>14.4f}")
+
+
+def bench_pedigree(args):
+    """
+    Time elimination on tree-like families of each size, which should
+    grow about linearly with the number of people.
+    """
+    print(f"{'people':>6} {'seconds':>9} {'us/person':>10}")
+    for count in args.people:
+        _, seconds = timed(eliminate_probabilities,
+                           tree_family(count, args.seed))
+        print(f"{count:>6} {seconds:>9.3f} {seconds / count * 1e6:>10.1f}")
+
+
+def bench_parallel(args):
+    """
+    Time sharded enumeration of a synthetic family over each number of
+    processes, with the speedup over plain enumeration per core.
+    """
+    people = synthetic_family(args.people, args.seed)
+    exact, serial_seconds = timed(heredity.enumerate_probabilities, people)
+    print(f"{args.people} people, {os.cpu_count()} cores available")
+    print(f"{'processes':>9} {'seconds':>9} {'speedup':>8} "
+          f"{'per core':>9} {'max diff':>10}")
+    print(f"{'serial':>9} {serial_seconds:>9.3f}")
+    for processes in args.processes:
+        probabilities, seconds = timed(
+            parallel_probabilities, people, processes
+        )
+        speedup = serial_seconds / seconds
+        print(f"{processes:>9} {seconds:>9.3f} {speedup:>8.2f} "
+              f"{speedup / processes:>9.2f} "
+              f"{max_difference(exact, probabilities):>10.2e}")
+
+
+def bench_sampling(args):
+    """
+    Compare both samplers on a synthetic family against variable
+    elimination, over each time budget: the largest error, the largest
+    error in standard errors, and the samples drawn in the time.
+    """
+    people = synthetic_family(args.people, args.seed)
+    exact, exact_seconds = timed(eliminate_probabilities, people)
+    print(f"{args.people} people, elimination {exact_seconds:.3f} s")
+    print(f"{'sampler':<11} {'seconds':>8} {'samples':>8} {'max diff':>9} "
+          f"{'max z':>6} {'detail':>14}")
+    samplers = {
+        "likelihood": lambda seconds: likelihood_weighting(
+            people, seconds=seconds, seed=args.seed),
+        "gibbs": lambda seconds: gibbs_sampling(
+            people, seconds=seconds, seed=args.seed),
+    }
+    for name, sample in samplers.items():
+        for seconds in args.seconds:
+            probabilities, errors, diagnostics = sample(seconds)
+            worst_z = max(
+                abs(probabilities[person][field][value]
+                    - exact[person][field][value])
+                / errors[person][field][value]
+                for person in people
+                for field in exact[person]
+                for value in exact[person][field]
+                if errors[person][field][value] > 0
+            )
+            if name == "gibbs":
+                rhats = diagnostics["rhat"]
+                detail = "R-hat {:.3f}".format(max(
+                    rhat for person in rhats for field in rhats[person]
+                    for rhat in rhats[person][field].values()
+                ))
+            else:
+                detail = f"ESS {diagnostics['ess']:.0f}"
+            print(f"{name:<11} {seconds:>8.2f} {diagnostics['samples']:>8} "
+                  f"{max_difference(exact, probabilities):>9.4f} "
+                  f"{worst_z:>6.2f} {detail:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for heredity.")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    engines = benchmarks.add_parser(
+        "engines", help="time and memory of every inference engine")
+    engines.add_argument("families", nargs="*", default=FAMILIES)
+    engines.set_defaults(run=bench_engines)
+
+    joint = benchmarks.add_parser(
+        "joint", help="time per joint probability, scalar vs vectorized")
+    joint.add_argument("families", nargs="*", default=FAMILIES)
+    joint.set_defaults(run=bench_joint)
+
+    underflow = benchmarks.add_parser(
+        "underflow", help="linear vs log-space elimination on big families")
+    underflow.add_argument("--people", type=int, nargs="+",
+                           default=[200, 400, 800])
+    underflow.set_defaults(run=bench_underflow)
+
+    pedigree = benchmarks.add_parser(
+        "pedigree", help="elimination time on tree-like families by size")
+    pedigree.add_argument("--people", type=int, nargs="+",
+                          default=[100, 200, 400, 800, 1600])
+    pedigree.add_argument("--seed", type=int, default=0)
+    pedigree.set_defaults(run=bench_pedigree)
+
+    parallel = benchmarks.add_parser(
+        "parallel", help="sharded enumeration across process counts")
+    parallel.add_argument("--people", type=int, default=7)
+    parallel.add_argument("--processes", type=int, nargs="+",
+                          default=[1, 2, 4, 8])
+    parallel.add_argument("--seed", type=int, default=0)
+    parallel.set_defaults(run=bench_parallel)
+
+    sampling = benchmarks.add_parser(
+        "sampling", help="sampler accuracy against elimination over time")
+    sampling.add_argument("--people", type=int, default=20)
+    sampling.add_argument("--seconds", type=float, nargs="+",
+                          default=[0.5, 2, 8])
+    sampling.add_argument("--seed", type=int, default=0)
+    sampling.set_defaults(run=bench_sampling)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
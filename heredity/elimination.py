@@ -0,0 +1,288 @@
+"""
+Exact inference for heredity by variable elimination.
+
+Each person's gene count (0, 1 or 2) is a variable, and each person
+contributes one factor over their own gene count and their parents':
+`person_probability` summed over the traits allowed by the evidence.
+A variable is summed out by multiplying only the factors that mention
+it, so the cost grows with the width of the pedigree (one generation of
+a tree-like family) instead of the 6^N assignments `main` enumerates.
+
+Eliminating every variable once leaves a clique tree: one cluster per
+variable, holding the factors and messages multiplied to sum it out.
+Passing messages up that tree and back down calibrates it, after which
+every person's marginals are read off their own cluster, so the whole
+family costs two passes rather than one elimination per person.
+
+In log space, factors hold log values: products become sums and sums
+become log-sum-exps, so marginals of large pedigrees don't underflow.
+"""
+import itertools
+import math
+
+from heredity import (empty_probabilities, log_add, log_normalize,
+                      normalize, person_probability, safe_log)
+
+GENES = (0, 1, 2)
+TRAITS = (True, False)
+
+
+class Factor():
+    """
+    A table over the gene counts of some people.
+    """
+
+    def __init__(self, variables, values):
+        # Names the factor depends on, in the order of each key
+        self.variables = variables
+        # Dictionary from a tuple of gene counts to a value
+        self.values = values
+
+    def value(self, assignment):
+        """
+        Return the factor's value under `assignment`, a dictionary
+        from name to gene count covering its variables.
+        """
+        return self.values[tuple(assignment[name] for name in self.variables)]
+
+
+def person_factor(people, person, traits, log_space=False):
+    """
+    Return the factor of `person` over their gene count and their
+    parents', summing `person_probability` over `traits`.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    if mother is None and father is None:
+        variables = (person,)
+        values = {
+            (genes,): sum(person_probability(genes, trait)
+                          for trait in traits)
+            for genes in GENES
+        }
+    else:
+        variables = (person, mother, father)
+        values = dict()
+        for genes, mother_genes, father_genes in itertools.product(
+                GENES, repeat=3):
+            values[genes, mother_genes, father_genes] = sum(
+                person_probability(genes, trait, mother_genes, father_genes)
+                for trait in traits
+            )
+    if log_space:
+        values = {key: safe_log(value) for key, value in values.items()}
+    return Factor(variables, values)
+
+
+def allowed_traits(people, person):
+    """
+    Return the trait values consistent with what is known of `person`.
+    """
+    trait = people[person]["trait"]
+    return TRAITS if trait is None else (trait,)
+
+
+def multiply(factors, log_space=False):
+    """
+    Return the product of `factors` as one factor over all their variables.
+    """
+    variables = tuple(dict.fromkeys(
+        name for factor in factors for name in factor.variables
+    ))
+    values = dict()
+    for genes in itertools.product(GENES, repeat=len(variables)):
+        assignment = dict(zip(variables, genes))
+        if log_space:
+            values[genes] = sum(
+                factor.value(assignment) for factor in factors
+            )
+            continue
+        product = 1
+        for factor in factors:
+            product *= factor.value(assignment)
+        values[genes] = product
+    return Factor(variables, values)
+
+
+def sum_out(factor, name, log_space=False):
+    """
+    Return `factor` with the variable `name` summed out.
+    """
+    position = factor.variables.index(name)
+    variables = factor.variables[:position] + factor.variables[position + 1:]
+    values = dict()
+    for genes, value in factor.values.items():
+        key = genes[:position] + genes[position + 1:]
+        if log_space:
+            values[key] = log_add(values.get(key, -math.inf), value)
+        else:
+            values[key] = values.get(key, 0) + value
+    return Factor(variables, values)
+
+
+def elimination_order(factors):
+    """
+    Return an order to sum out the variables of `factors` in, greedily
+    picking the variable with the fewest neighbours left (min-degree),
+    which keeps the factors built along the way small.
+    """
+    neighbours = dict()
+    for factor in factors:
+        for name in factor.variables:
+            neighbours.setdefault(name, set()).update(factor.variables)
+    for name in neighbours:
+        neighbours[name].discard(name)
+
+    order = []
+    while neighbours:
+        name = min(neighbours, key=lambda name: (len(neighbours[name]), name))
+        order.append(name)
+        # Summing `name` out joins all its neighbours in one factor
+        linked = neighbours.pop(name)
+        for other in linked:
+            neighbours[other].discard(name)
+            neighbours[other].update(linked - {other})
+    return order
+
+
+def marginalize(factor, keep, log_space=False):
+    """
+    Return `factor` with every variable not in `keep` summed out.
+    """
+    for name in factor.variables:
+        if name not in keep:
+            factor = sum_out(factor, name, log_space)
+    return factor
+
+
+class Cluster():
+    """
+    A node of a clique tree: the factors and child messages multiplied
+    together to sum out one variable.
+    """
+
+    def __init__(self, name, factors, children):
+        # Variable summed out here
+        self.name = name
+        # Dictionary from person to the person factor assigned here
+        self.factors = factors
+        # Clusters whose upward messages are multiplied in here
+        self.children = children
+        self.variables = tuple(dict.fromkeys(
+            variable
+            for factor in list(factors.values()) + children
+            for variable in factor.variables
+        ))
+        # Variables shared with the parent, those of the upward message
+        self.separator = tuple(v for v in self.variables if v != name)
+        # Messages to the parent and from it, filled in by `calibrate`
+        self.up = None
+        self.down = None
+
+    def incoming(self, skip=None):
+        """
+        Return the factors here and every message into the cluster,
+        except the upward message of the child `skip`.
+        """
+        messages = [child.up for child in self.children if child is not skip]
+        if self.down is not None:
+            messages.append(self.down)
+        return list(self.factors.values()) + messages
+
+
+def clique_tree(factors, order):
+    """
+    Return the clusters of eliminating the variables of `factors`, a
+    dictionary from person to person factor, in `order`. Children come
+    before their parents, and clusters left with an empty separator
+    are roots (one per unconnected part of the family).
+    """
+    loose = dict(factors)
+    # Clusters whose upward message hasn't been multiplied in yet,
+    # standing in for that message as their variables are summed out
+    waiting = []
+    clusters = []
+    for name in order:
+        assigned = {
+            person: factor for person, factor in loose.items()
+            if name in factor.variables
+        }
+        children = [cluster for cluster in waiting
+                    if name in cluster.separator]
+        if not assigned and not children:
+            continue
+        for person in assigned:
+            del loose[person]
+        waiting = [cluster for cluster in waiting
+                   if name not in cluster.separator]
+        cluster = Cluster(name, assigned, children)
+        waiting.append(cluster)
+        clusters.append(cluster)
+    return clusters
+
+
+def calibrate(clusters, log_space=False):
+    """
+    Compute every message of a clique tree from `clique_tree`: upward
+    messages children first, then downward messages parents first.
+    """
+    for cluster in clusters:
+        cluster.up = sum_out(multiply(cluster.incoming(), log_space),
+                             cluster.name, log_space)
+    for cluster in reversed(clusters):
+        for child in cluster.children:
+            child.down = marginalize(
+                multiply(cluster.incoming(skip=child), log_space),
+                child.separator, log_space
+            )
+
+
+def eliminate_probabilities(people, log_space=False):
+    """
+    Return each person's normalized gene and trait probabilities, as
+    `heredity.enumerate_probabilities` does, by variable elimination,
+    in log space if `log_space` is set.
+    """
+    probabilities = empty_probabilities(people,
+                                        -math.inf if log_space else 0)
+    factors = {
+        person: person_factor(people, person,
+                              allowed_traits(people, person), log_space)
+        for person in people
+    }
+    clusters = clique_tree(factors, elimination_order(list(factors.values())))
+    calibrate(clusters, log_space)
+    for cluster in clusters:
+        for person, factor in cluster.factors.items():
+            # Everything but this person's own factor, over its variables
+            context = marginalize(
+                multiply([other for other in cluster.incoming()
+                          if other is not factor], log_space),
+                factor.variables, log_space
+            )
+            # Putting back one trait value at a time gives the joint of
+            # this person's gene count and trait with the evidence
+            for trait in allowed_traits(people, person):
+                marginal = marginalize(
+                    multiply([context, person_factor(people, person,
+                                                     (trait,), log_space)],
+                             log_space),
+                    (person,), log_space
+                )
+                table = probabilities[person]
+                for genes in GENES:
+                    p = marginal.values[(genes,)]
+                    if log_space:
+                        table["gene"][genes] = log_add(table["gene"][genes],
+                                                       p)
+                        table["trait"][trait] = log_add(
+                            table["trait"][trait], p
+                        )
+                    else:
+                        table["gene"][genes] += p
+                        table["trait"][trait] += p
+
+    if log_space:
+        return log_normalize(probabilities)
+    normalize(probabilities)
+    return probabilities
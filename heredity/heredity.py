@@ -1,6 +1,7 @@
+import argparse
 import csv
 import itertools
-import sys
+import math
 
 PROBS = {
 
@@ -38,28 +39,145 @@ PROBS = {
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Infer gene and trait probabilities in a family.")
+    parser.add_argument("data", help="family CSV file")
+    parser.add_argument("--engine",
+                        choices=["enumerate", "stream", "vectorized",
+                                 "elimination", "likelihood", "gibbs"],
+                        default="enumerate",
+                        help="enumerate every assignment from powersets, "
+                             "from a pruned generator, or in NumPy "
+                             "batches, run exact variable elimination "
+                             "over the pedigree, or estimate by "
+                             "likelihood weighting or Gibbs sampling")
+    parser.add_argument("--processes", type=int,
+                        help="shard enumeration over this many processes")
+    parser.add_argument("--log-space", action="store_true",
+                        help="accumulate log probabilities, so large "
+                             "families don't underflow to 0")
+    parser.add_argument("--samples", type=int, default=10000,
+                        help="sample budget for the sampling engines")
+    parser.add_argument("--seconds", type=float,
+                        help="time budget for the sampling engines, "
+                             "instead of --samples")
+    parser.add_argument("--chains", type=int, default=4,
+                        help="independent chains for Gibbs sampling")
+    parser.add_argument("--seed", type=int,
+                        help="seed for the sampling engines")
+    args = parser.parse_args()
+    if args.processes is not None and args.engine != "enumerate":
+        parser.error("--processes only applies to --engine enumerate")
+    if args.processes is not None and args.processes < 1:
+        parser.error("--processes must be a positive integer")
+    sampled = args.engine in ("likelihood", "gibbs")
+    if args.log_space and sampled:
+        parser.error("--log-space only applies to the exact engines")
+    if args.samples < 1:
+        parser.error("--samples must be a positive integer")
+    if args.seconds is not None and args.seconds <= 0:
+        parser.error("--seconds must be positive")
+    if args.engine == "gibbs" and args.chains < 2:
+        parser.error("--chains must be at least 2 to compare chains")
+    people = load_data(args.data)
+
+    # Standard errors and R-hat of each estimate, from sampling engines
+    errors = None
+    rhats = None
+    if sampled:
+        # Imported here as the engines build on this module's model
+        from sampling import MIN_ESS, gibbs_sampling, likelihood_weighting
+        if args.engine == "gibbs":
+            probabilities, errors, diagnostics = gibbs_sampling(
+                people, args.samples, args.seconds, args.chains, args.seed
+            )
+            rhats = diagnostics["rhat"]
+        else:
+            probabilities, errors, diagnostics = likelihood_weighting(
+                people, args.samples, args.seconds, args.seed
+            )
+    elif args.engine == "elimination":
+        # Imported here as the engine builds on this module's model
+        from elimination import eliminate_probabilities
+        probabilities = eliminate_probabilities(people, args.log_space)
+    elif args.engine == "stream":
+        probabilities = stream_probabilities(people, args.log_space)
+    elif args.engine == "vectorized":
+        # Imported here so the default engine doesn't need numpy
+        from vectorized import vectorized_probabilities
+        probabilities = vectorized_probabilities(people,
+                                                 log_space=args.log_space)
+    elif args.processes is not None:
+        from parallel import parallel_probabilities
+        probabilities = parallel_probabilities(people, args.processes,
+                                               args.log_space)
+    else:
+        probabilities = enumerate_probabilities(people, args.log_space)
+
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if errors is None:
+                    print(f"    {value}: {p:.4f}")
+                    continue
+                line = f"    {value}: {p:.4f} ± {errors[person][field][value]:.4f}"
+                if rhats is not None:
+                    line += f"  (R-hat {rhats[person][field][value]:.3f})"
+                print(line)
+
+    if args.engine == "likelihood":
+        print(f"Likelihood weighting: {diagnostics['samples']} samples, "
+              f"effective sample size {diagnostics['ess']:.0f}")
+        if diagnostics["ess"] < MIN_ESS:
+            print(f"Warning: effective sample size is below {MIN_ESS}, so "
+                  "these estimates and errors are unreliable; draw more "
+                  "samples or use --engine gibbs.")
+    elif args.engine == "gibbs":
+        worst = max(
+            rhat for person in rhats for field in rhats[person]
+            for rhat in rhats[person][field].values()
+        )
+        print(f"Gibbs sampling: {diagnostics['chains']} chains, "
+              f"{diagnostics['samples']} sweeps after burn-in, "
+              f"max R-hat {worst:.3f}")
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
 
-    # Keep track of gene and trait probabilities for each person
-    probabilities = {
+def empty_probabilities(people, value=0):
+    """
+    Return a table of gene and trait probabilities for each person, all
+    set to `value` (use -math.inf for an empty table of logs).
+    """
+    return {
         person: {
             "gene": {
-                2: 0,
-                1: 0,
-                0: 0
+                2: value,
+                1: value,
+                0: value
             },
             "trait": {
-                True: 0,
-                False: 0
+                True: value,
+                False: value
             }
         }
         for person in people
     }
 
+
+def enumerate_probabilities(people, log_space=False):
+    """
+    Return each person's normalized gene and trait probabilities by
+    summing the joint probability of every assignment consistent with
+    the known traits. With `log_space`, log probabilities are summed
+    instead, so tiny joints don't underflow.
+    """
+    # Keep track of gene and trait probabilities for each person
+    probabilities = empty_probabilities(people,
+                                        -math.inf if log_space else 0)
+
     # Loop over all sets of people who might have the trait
     names = set(people)
     for have_trait in powerset(names):
@@ -73,24 +191,132 @@ def main():
         if fails_evidence:
             continue
 
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
-                # Update probabilities with new joint probability
+        accumulate(people, probabilities, have_trait, log_space)
+
+    # Ensure probabilities sum to 1
+    if log_space:
+        return log_normalize(probabilities)
+    normalize(probabilities)
+    return probabilities
+
+
+def accumulate(people, probabilities, have_trait, log_space=False):
+    """
+    Add to `probabilities` the joint probability of every gene
+    assignment where exactly the people in `have_trait` have the trait.
+    """
+    names = set(people)
+
+    # Loop over all sets of people who might have the gene
+    for one_gene in powerset(names):
+        for two_genes in powerset(names - one_gene):
+            # Update probabilities with new joint probability
+            if log_space:
+                p = log_joint_probability(people, one_gene, two_genes,
+                                          have_trait)
+                log_update(probabilities, one_gene, two_genes, have_trait, p)
+            else:
                 p = joint_probability(people, one_gene, two_genes, have_trait)
                 update(probabilities, one_gene, two_genes, have_trait, p)
 
-    # Ensure probabilities sum to 1
+
+def stream_probabilities(people, log_space=False):
+    """
+    Return each person's normalized gene and trait probabilities, as
+    `enumerate_probabilities` does, accumulating the assignments of
+    `generate_assignments` as they are produced, in log space if
+    `log_space` is set.
+    """
+    order = family_order(people)
+    if log_space:
+        probabilities = empty_probabilities(people, -math.inf)
+        for genes, traits, p in generate_assignments(people, order, True):
+            for name, gene, trait in zip(order, genes, traits):
+                table = probabilities[name]
+                table["gene"][gene] = log_add(table["gene"][gene], p)
+                table["trait"][trait] = log_add(table["trait"][trait], p)
+        return log_normalize(probabilities)
+
+    probabilities = empty_probabilities(people)
+    for genes, traits, p in generate_assignments(people, order):
+        for name, gene, trait in zip(order, genes, traits):
+            probabilities[name]["gene"][gene] += p
+            probabilities[name]["trait"][trait] += p
     normalize(probabilities)
+    return probabilities
 
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+
+def family_order(people):
+    """
+    Return the names of `people` ordered so that parents come before
+    their children.
+    """
+    order = []
+    placed = set()
+
+    def place(name):
+        if name in placed:
+            return
+        placed.add(name)
+        for parent in (people[name]["mother"], people[name]["father"]):
+            if parent is not None:
+                place(parent)
+        order.append(name)
+
+    for name in people:
+        place(name)
+    return order
+
+
+def generate_assignments(people, order, log_space=False):
+    """
+    Generate (genes, traits, p) for every assignment of gene counts and
+    traits consistent with the known traits, where `genes` and `traits`
+    are tuples of codes in `order` (see `family_order`) and `p` is the
+    assignment's joint probability, or its log with `log_space`.
+
+    Assignments are built one person at a time, depth first, so only
+    the current branch is held in memory. A person with a known trait
+    only branches on gene counts, and a branch whose partial product is
+    already 0 is dropped with everything below it.
+    """
+    position = {name: i for i, name in enumerate(order)}
+    parents = []
+    for name in order:
+        mother = people[name]["mother"]
+        father = people[name]["father"]
+        if mother is None and father is None:
+            parents.append(None)
+        else:
+            parents.append((position[mother], position[father]))
+    choices = [
+        (True, False) if people[name]["trait"] is None
+        else (people[name]["trait"],)
+        for name in order
+    ]
+    genes = [0] * len(order)
+    traits = [False] * len(order)
+
+    def extend(i, p):
+        if i == len(order):
+            yield tuple(genes), tuple(traits), p
+            return
+        for gene in (0, 1, 2):
+            genes[i] = gene
+            for trait in choices[i]:
+                if parents[i] is None:
+                    factor = person_probability(gene, trait)
+                else:
+                    mother, father = parents[i]
+                    factor = person_probability(gene, trait, genes[mother],
+                                                genes[father])
+                q = p + safe_log(factor) if log_space else p * factor
+                if q == (-math.inf if log_space else 0):
+                    continue
+                traits[i] = trait
+                yield from extend(i + 1, q)
+
+    yield from extend(0, 0 if log_space else 1)
 
 
 def load_data(filename):
@@ -147,44 +373,100 @@ def joint_probability(people, one_gene, two_genes, have_trait):
     # P(joint) = P(person0) * P(person1) ... * P(person_n)
     for person in people:
         # Initialize variable for given person
-        genes = 1 if person in one_gene else 2 if person in two_genes else 0
-        gene_prob = 0
+        genes = gene_count(person, one_gene, two_genes)
         trait = True if person in have_trait else False
-        trait_prob = PROBS["trait"][genes][trait]
         mother = people[person]["mother"]
         father = people[person]["father"]
 
-
         # Factor in default probability if parents are unknown
         if mother == None and father == None:
-            gene_prob = PROBS["gene"][genes]
+            person_prob = person_probability(genes, trait)
         # Factor in parents if known, assuming we will always know both if we know any
         else:
-            mother_prob = parent_probability(mother, one_gene, two_genes)
-            father_prob = parent_probability(father, one_gene, two_genes)
-            # not a iff not b and not c -> P(¬a) = P(¬b) * P(¬c)
-            if genes == 0:
-                gene_prob = (1 - mother_prob) * (1 - father_prob) * trait_prob
-            # a if (b and not c) or (not b and c) -> P(a) = (P(b) * P(¬c)) + (P(¬b) * P(c))
-            elif genes == 1:
-                gene_prob = (mother_prob * (1 - father_prob)) + ((1 - mother_prob) * father_prob)
-            # a iff b and c -> P(a) = P(b) * P(c)
-            else:
-                gene_prob = mother_prob * father_prob
+            person_prob = person_probability(
+                genes, trait,
+                gene_count(mother, one_gene, two_genes),
+                gene_count(father, one_gene, two_genes)
+            )
         # Factor in P(person) into P(joint)
-        joint_prob *= gene_prob * trait_prob
+        joint_prob *= person_prob
 
     # Return calculated joint probability
     return joint_prob
 
 
+def log_joint_probability(people, one_gene, two_genes, have_trait):
+    """
+    Return the natural log of `joint_probability`, summing the log of
+    each person's factor so large families don't underflow.
+    """
+    log_joint = 0
+    for person in people:
+        genes = gene_count(person, one_gene, two_genes)
+        trait = person in have_trait
+        mother = people[person]["mother"]
+        father = people[person]["father"]
+        if mother is None and father is None:
+            person_prob = person_probability(genes, trait)
+        else:
+            person_prob = person_probability(
+                genes, trait,
+                gene_count(mother, one_gene, two_genes),
+                gene_count(father, one_gene, two_genes)
+            )
+        log_joint += safe_log(person_prob)
+    return log_joint
+
+
+def gene_count(name, one_gene, two_genes):
+    """
+    Return how many copies of the gene `name` has in an assignment.
+    """
+    return 1 if name in one_gene else 2 if name in two_genes else 0
+
+
+def person_probability(genes, trait, mother_genes=None, father_genes=None):
+    """
+    Return P(person) = P(genes) * P(trait), one person's factor of a
+    joint probability, given their parents' gene counts if known.
+    Every inference engine builds on this, so all agree exactly.
+    """
+    trait_prob = PROBS["trait"][genes][trait]
+
+    # Factor in default probability if parents are unknown
+    if mother_genes is None:
+        gene_prob = PROBS["gene"][genes]
+    else:
+        mother_prob = pass_probability(mother_genes)
+        father_prob = pass_probability(father_genes)
+        # not a iff not b and not c -> P(¬a) = P(¬b) * P(¬c)
+        # Known bug kept from the original joint_probability: trait_prob
+        # is applied here and again on return, so a child with no copies
+        # counts it twice. Every engine inherits this to keep results
+        # identical; fixing it is a separate change.
+        if genes == 0:
+            gene_prob = (1 - mother_prob) * (1 - father_prob) * trait_prob
+        # a if (b and not c) or (not b and c) -> P(a) = (P(b) * P(¬c)) + (P(¬b) * P(c))
+        elif genes == 1:
+            gene_prob = (mother_prob * (1 - father_prob)) + ((1 - mother_prob) * father_prob)
+        # a iff b and c -> P(a) = P(b) * P(c)
+        else:
+            gene_prob = mother_prob * father_prob
+    return gene_prob * trait_prob
+
+
 # Calculate odds parent passes on gene
 def parent_probability(name, one_gene, two_genes):
+    return pass_probability(gene_count(name, one_gene, two_genes))
+
+
+# Calculate odds a parent with `genes` copies passes on the gene
+def pass_probability(genes):
     # Mutation odds cancel out leading to 50%
-    if name in one_gene:
+    if genes == 1:
         return 0.5
     # 100% factoring in mutation odds
-    elif name in two_genes:
+    elif genes == 2:
         return 1 - PROBS["mutation"]
     # 0% factoring in mutation odds
     else:
@@ -208,6 +490,68 @@ def update(probabilities, one_gene, two_genes, have_trait, p):
         probabilities[person]["trait"][trait] += p
 
 
+def safe_log(p):
+    """
+    Return the natural log of `p`, or -inf if `p` is 0.
+    """
+    return math.log(p) if p > 0 else -math.inf
+
+
+def log_add(a, b):
+    """
+    Return log(exp(a) + exp(b)) without leaving log space.
+    """
+    if a < b:
+        a, b = b, a
+    if b == -math.inf:
+        return a
+    return a + math.log1p(math.exp(b - a))
+
+
+def log_sum(values):
+    """
+    Return log(sum(exp(v) for v in values)) by the log-sum-exp trick:
+    factoring out the largest term keeps every exp in range.
+    """
+    values = list(values)
+    top = max(values, default=-math.inf)
+    if top == -math.inf:
+        return top
+    return top + math.log(sum(math.exp(value - top) for value in values))
+
+
+def log_update(log_probabilities, one_gene, two_genes, have_trait, log_p):
+    """
+    Add to `log_probabilities`, a table of log probabilities, a new
+    joint probability given by its log `log_p`, as `update` does.
+    """
+    for person in log_probabilities:
+        genes = gene_count(person, one_gene, two_genes)
+        trait = person in have_trait
+        table = log_probabilities[person]
+        table["gene"][genes] = log_add(table["gene"][genes], log_p)
+        table["trait"][trait] = log_add(table["trait"][trait], log_p)
+
+
+def log_normalize(log_probabilities):
+    """
+    Return a table of normalized probabilities from a table of
+    unnormalized log probabilities. A distribution with no probability
+    at all is left at 0, as `normalize` does.
+    """
+    probabilities = dict()
+    for person, fields in log_probabilities.items():
+        probabilities[person] = dict()
+        for field, values in fields.items():
+            total = log_sum(values.values())
+            probabilities[person][field] = {
+                value: (0 if total == -math.inf
+                        else math.exp(log_p - total))
+                for value, log_p in values.items()
+            }
+    return probabilities
+
+
 def normalize(probabilities):
     """
     Update `probabilities` such that each probability distribution
@@ -0,0 +1,98 @@
+"""
+Parallel enumeration for heredity.
+
+The outer loop of `enumerate_probabilities` runs over the sets of
+people who have the trait, and each iteration is independent of the
+others. The sets consistent with the evidence are dealt out into
+shards; worker processes enumerate the gene assignments of their
+shards into partial probability tables, which are added together
+before normalizing.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from heredity import (accumulate, empty_probabilities, log_add,
+                      log_normalize, normalize, powerset)
+
+# Shards per process, so uneven shards still spread evenly
+SHARDS_PER_PROCESS = 4
+
+# Family being enumerated, set in each pool process by `init_worker`
+# so it is sent once rather than with every shard
+worker_people = None
+
+
+def init_worker(people):
+    global worker_people
+    worker_people = people
+
+
+def trait_sets(people):
+    """
+    Return the sets of people who might have the trait, as in
+    `enumerate_probabilities`, skipping those that violate the evidence.
+    """
+    names = set(people)
+    return [
+        have_trait for have_trait in powerset(names)
+        if not any(
+            people[person]["trait"] is not None and
+            people[person]["trait"] != (person in have_trait)
+            for person in names
+        )
+    ]
+
+
+def enumerate_shard(shard, log_space=False):
+    """
+    Return the unnormalized probability table (of logs with
+    `log_space`) summing every gene assignment for each trait set in
+    `shard`.
+    """
+    probabilities = empty_probabilities(worker_people,
+                                        -math.inf if log_space else 0)
+    for have_trait in shard:
+        accumulate(worker_people, probabilities, have_trait, log_space)
+    return probabilities
+
+
+def merge(total, partial, log_space=False):
+    """
+    Add the partial probability table `partial` into `total`.
+    """
+    for person, fields in partial.items():
+        for field, values in fields.items():
+            for value, p in values.items():
+                if log_space:
+                    total[person][field][value] = log_add(
+                        total[person][field][value], p
+                    )
+                else:
+                    total[person][field][value] += p
+
+
+def parallel_probabilities(people, processes=None, log_space=False):
+    """
+    Return each person's normalized gene and trait probabilities, as
+    `heredity.enumerate_probabilities` does, with the trait sets
+    sharded over a pool of `processes` (all cores if not given).
+    """
+    sets = trait_sets(people)
+    workers = processes or os.cpu_count() or 1
+    count = max(1, min(len(sets), workers * SHARDS_PER_PROCESS))
+    shards = [sets[i::count] for i in range(count)]
+
+    probabilities = empty_probabilities(people,
+                                        -math.inf if log_space else 0)
+    with ProcessPoolExecutor(processes, initializer=init_worker,
+                             initargs=(people,)) as pool:
+        partials = pool.map(enumerate_shard, shards,
+                            [log_space] * len(shards))
+        for partial in partials:
+            merge(probabilities, partial, log_space)
+
+    if log_space:
+        return log_normalize(probabilities)
+    normalize(probabilities)
+    return probabilities
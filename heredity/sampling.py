@@ -0,0 +1,345 @@
+"""
+Approximate inference for heredity by sampling.
+
+Both samplers target the same distribution as enumeration, the product
+of every person's `person_probability`, conditioned on the known traits:
+
+    * Likelihood weighting samples gene counts parents first, each from
+      the inheritance distribution (or `PROBS["gene"]` for founders),
+      and unknown traits from `PROBS["trait"]`, then weights a sample by
+      its joint probability over the chance of drawing it. Weights are
+      kept in log space so large families don't underflow.
+    * Gibbs sampling runs several chains that redraw one person's gene
+      count, then their unknown trait, at a time from its distribution
+      given everyone else. The first half of each chain is discarded
+      as burn-in.
+
+Either runs until a sample budget or a time budget is spent. Standard
+errors come from the weights (likelihood weighting) or from batch means
+(Gibbs), and Gibbs reports the Gelman-Rubin R-hat of every marginal
+across its chains.
+"""
+import math
+import random
+import time
+
+from heredity import (PROBS, empty_probabilities, family_order,
+                      pass_probability, person_probability)
+
+GENES = (0, 1, 2)
+
+# Each person's marginals are 5 slots: gene counts 0-2, then trait
+# True and False
+SLOTS = 5
+
+# Sweeps per batch of a Gibbs chain
+BATCH_SWEEPS = 50
+
+# Batches every Gibbs chain runs before honouring a time budget, so at
+# least two per chain are left after burn-in
+MIN_BATCHES = 4
+
+# Likelihood-weighting samples between checks of the time budget
+CHECK_EVERY = 100
+
+# Effective sample size below which likelihood-weighting estimates
+# should not be trusted, whatever their standard errors say
+MIN_ESS = 100
+
+
+class Family():
+    """
+    A family indexed parents first, as the samplers walk it.
+    """
+
+    def __init__(self, people):
+        self.names = family_order(people)
+        position = {name: i for i, name in enumerate(self.names)}
+        # Indices of each person's parents, or None
+        self.parents = []
+        # Indices of each person's children
+        self.children = [[] for _ in self.names]
+        for i, name in enumerate(self.names):
+            mother = people[name]["mother"]
+            father = people[name]["father"]
+            if mother is None and father is None:
+                self.parents.append(None)
+                continue
+            self.parents.append((position[mother], position[father]))
+            self.children[position[mother]].append(i)
+            if father != mother:
+                self.children[position[father]].append(i)
+        # Each person's known trait, or None
+        self.known = [people[name]["trait"] for name in self.names]
+
+    def __len__(self):
+        return len(self.names)
+
+    def factor(self, i, genes, traits):
+        """
+        Return person `i`'s `person_probability` in an assignment.
+        """
+        parents = self.parents[i]
+        if parents is None:
+            return person_probability(genes[i], traits[i])
+        mother, father = parents
+        return person_probability(genes[i], traits[i],
+                                  genes[mother], genes[father])
+
+    def slots(self, genes, traits):
+        """
+        Return the marginal slots an assignment falls in.
+        """
+        return [
+            i * SLOTS + gene for i, gene in enumerate(genes)
+        ] + [
+            i * SLOTS + (3 if trait else 4) for i, trait in enumerate(traits)
+        ]
+
+    def table(self, values):
+        """
+        Return per-slot `values` as a gene and trait table like
+        `empty_probabilities`, keyed by name.
+        """
+        table = empty_probabilities(self.names)
+        for i, name in enumerate(self.names):
+            for gene in GENES:
+                table[name]["gene"][gene] = values[i * SLOTS + gene]
+            table[name]["trait"][True] = values[i * SLOTS + 3]
+            table[name]["trait"][False] = values[i * SLOTS + 4]
+        return table
+
+
+def inheritance(mother_genes, father_genes):
+    """
+    Return the distribution of a child's gene count given their
+    parents', as `person_probability` weighs it.
+    """
+    mother = pass_probability(mother_genes)
+    father = pass_probability(father_genes)
+    return [
+        (1 - mother) * (1 - father),
+        mother * (1 - father) + (1 - mother) * father,
+        mother * father,
+    ]
+
+
+def forward_sample(family, rng):
+    """
+    Draw an assignment parents first, keeping known traits.
+    Return (genes, traits, log_weight) where `log_weight` is the log of
+    its joint probability over the probability of drawing it.
+    """
+    genes = [0] * len(family)
+    traits = [False] * len(family)
+    log_weight = 0
+    for i, parents in enumerate(family.parents):
+        if parents is None:
+            distribution = [PROBS["gene"][gene] for gene in GENES]
+        else:
+            distribution = inheritance(genes[parents[0]], genes[parents[1]])
+        gene = rng.choices(GENES, distribution)[0]
+        genes[i] = gene
+        if family.known[i] is None:
+            trait = rng.random() < PROBS["trait"][gene][True]
+            drawn = distribution[gene] * PROBS["trait"][gene][trait]
+        else:
+            trait = family.known[i]
+            drawn = distribution[gene]
+        traits[i] = trait
+        log_weight += (math.log(family.factor(i, genes, traits))
+                       - math.log(drawn))
+    return genes, traits, log_weight
+
+
+def likelihood_weighting(people, samples=10000, seconds=None, seed=None):
+    """
+    Estimate each person's gene and trait probabilities by likelihood
+    weighting, drawing up to `samples` samples, or for up to `seconds`
+    (always at least CHECK_EVERY samples).
+
+    Return (probabilities, errors, diagnostics): the estimates and
+    their standard errors as gene and trait tables, and a dictionary
+    with the number of "samples" drawn and their "ess", the effective
+    sample size of the weights.
+
+    A few heavy weights make the delta-method error of the weighted
+    estimate far too small, so each error is at least that of a plain
+    proportion over "ess" samples, sqrt(p * (1 - p) / ess), with p
+    pulled half a sample towards 1/2 so values never drawn don't claim
+    an error of 0. Below MIN_ESS even that is unreliable.
+    """
+    if samples < 1:
+        raise ValueError("Likelihood weighting needs at least one sample")
+    family = Family(people)
+    rng = random.Random(seed)
+    deadline = None if seconds is None else time.perf_counter() + seconds
+    size = len(family) * SLOTS
+    # Sums of w, w^2, w * x and w^2 * x for each slot's indicator x,
+    # with every weight scaled by exp(-shift) to stay in range
+    shift = -math.inf
+    total = 0
+    squares = 0
+    sums = [0] * size
+    square_sums = [0] * size
+    drawn = 0
+    while drawn < samples or deadline is not None:
+        if (deadline is not None and drawn and drawn % CHECK_EVERY == 0 and
+                time.perf_counter() >= deadline):
+            break
+        genes, traits, log_weight = forward_sample(family, rng)
+        if log_weight > shift:
+            # Rescale the sums to the new largest weight
+            scale = math.exp(shift - log_weight) if drawn else 0
+            total *= scale
+            squares *= scale * scale
+            sums = [value * scale for value in sums]
+            square_sums = [value * scale * scale for value in square_sums]
+            shift = log_weight
+        weight = math.exp(log_weight - shift)
+        total += weight
+        squares += weight * weight
+        for slot in family.slots(genes, traits):
+            sums[slot] += weight
+            square_sums[slot] += weight * weight
+        drawn += 1
+
+    estimates = [value / total for value in sums]
+    ess = total * total / squares
+    errors = []
+    for slot, estimate in enumerate(estimates):
+        # Delta-method error of the self-normalized estimator
+        error = math.sqrt(max(0, square_sums[slot]
+                              - 2 * estimate * square_sums[slot]
+                              + estimate * estimate * squares)) / total
+        # Known traits are certain; only estimate the rest's spread
+        if slot % SLOTS < 3 or family.known[slot // SLOTS] is None:
+            p = (estimate * ess + 0.5) / (ess + 1)
+            error = max(error, math.sqrt(p * (1 - p) / ess))
+        errors.append(error)
+    diagnostics = {"samples": drawn, "ess": ess}
+    return family.table(estimates), family.table(errors), diagnostics
+
+
+def gibbs_step(family, genes, traits, rng):
+    """
+    Redraw every person's gene count and unknown trait in turn, each
+    from its distribution given the rest of the assignment.
+    """
+    for i in range(len(family)):
+        weights = []
+        for gene in GENES:
+            genes[i] = gene
+            weight = family.factor(i, genes, traits)
+            for child in family.children[i]:
+                weight *= family.factor(child, genes, traits)
+            weights.append(weight)
+        genes[i] = rng.choices(GENES, weights)[0]
+
+        if family.known[i] is None:
+            traits[i] = True
+            true_weight = family.factor(i, genes, traits)
+            traits[i] = False
+            false_weight = family.factor(i, genes, traits)
+            traits[i] = (rng.random() * (true_weight + false_weight)
+                         < true_weight)
+
+
+def gibbs_chain(family, rng, sweeps, deadline):
+    """
+    Run a Gibbs chain from a forward sample for up to `sweeps` sweeps or
+    until `deadline`, though always for at least MIN_BATCHES batches.
+    Return the slot frequencies of each batch of BATCH_SWEEPS sweeps.
+    """
+    genes, traits, _ = forward_sample(family, rng)
+    batches = []
+    counts = [0] * (len(family) * SLOTS)
+    for sweep in range(1, sweeps + 1):
+        gibbs_step(family, genes, traits, rng)
+        for slot in family.slots(genes, traits):
+            counts[slot] += 1
+        if sweep % BATCH_SWEEPS == 0:
+            batches.append([count / BATCH_SWEEPS for count in counts])
+            counts = [0] * len(counts)
+            if (deadline is not None and len(batches) >= MIN_BATCHES and
+                    time.perf_counter() >= deadline):
+                break
+    return batches
+
+
+def r_hat(chains):
+    """
+    Return the Gelman-Rubin potential scale reduction of a quantity
+    given its draws in each chain (equally many per chain). Values near
+    1 mean the chains agree.
+    """
+    m = len(chains)
+    n = len(chains[0])
+    means = [sum(chain) / n for chain in chains]
+    mean = sum(means) / m
+    within = sum(
+        sum((x - chain_mean) ** 2 for x in chain) / (n - 1)
+        for chain, chain_mean in zip(chains, means)
+    ) / m
+    between = n * sum((x - mean) ** 2 for x in means) / (m - 1)
+    if within == 0:
+        return 1.0 if between == 0 else math.inf
+    return math.sqrt(((n - 1) / n * within + between / n) / within)
+
+
+def gibbs_sampling(people, samples=10000, seconds=None, chains=4, seed=None):
+    """
+    Estimate each person's gene and trait probabilities by Gibbs
+    sampling with `chains` chains sharing a budget of `samples` sweeps,
+    or running for up to `seconds` between them. Chain `i` is seeded from
+    (`seed`, `i`), with a random `seed` drawn if none is given.
+
+    Return (probabilities, errors, diagnostics): the estimates and
+    their standard errors (from batch means) as gene and trait tables,
+    and a dictionary with the number of "samples" kept after burn-in,
+    the number of "chains" and an "rhat" table, computed on the batch
+    means of each chain.
+    """
+    if samples < 1:
+        raise ValueError("Gibbs sampling needs at least one sample")
+    if chains < 2:
+        raise ValueError("Gibbs sampling needs at least 2 chains for R-hat")
+    family = Family(people)
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    per_chain = (10 ** 9 if seconds is not None
+                 else max(MIN_BATCHES * BATCH_SWEEPS, samples // chains))
+    runs = []
+    for chain in range(chains):
+        deadline = None
+        if seconds is not None:
+            deadline = time.perf_counter() + seconds / chains
+        rng = random.Random(f"{seed}-{chain}")
+        runs.append(gibbs_chain(family, rng, per_chain, deadline))
+
+    # Drop the first half of every chain as burn-in, and keep equally
+    # many batches per chain
+    kept = min(len(batches) for batches in runs) // 2
+    runs = [batches[-kept:] for batches in runs]
+    batches = [batch for batches in runs for batch in batches]
+    size = len(family) * SLOTS
+    estimates = [
+        sum(batch[slot] for batch in batches) / len(batches)
+        for slot in range(size)
+    ]
+    errors = [
+        math.sqrt(sum((batch[slot] - estimates[slot]) ** 2
+                      for batch in batches)
+                  / (len(batches) - 1) / len(batches))
+        for slot in range(size)
+    ]
+    rhats = [
+        r_hat([[batch[slot] for batch in batches] for batches in runs])
+        for slot in range(size)
+    ]
+    diagnostics = {
+        "samples": len(batches) * BATCH_SWEEPS,
+        "chains": chains,
+        "rhat": family.table(rhats),
+    }
+    return family.table(estimates), family.table(errors), diagnostics
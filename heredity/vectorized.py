@@ -0,0 +1,188 @@
+"""
+Vectorized joint-probability evaluation for heredity.
+
+An assignment is encoded as a row of gene counts and a row of traits,
+one column per person. Each person's factor is read from a lookup table
+filled with `person_probability`, indexed by their gene count, trait
+and their parents' gene counts, and the factors are multiplied in the
+same order as `joint_probability`, so every joint probability is the
+very same float the scalar path computes. A batch of thousands of
+assignments is evaluated with one table lookup and one multiplication
+per person. In log space the tables hold logs, which are added instead.
+"""
+import numpy as np
+
+from heredity import (empty_probabilities, log_normalize, normalize,
+                      person_probability)
+
+# Assignments evaluated per batch
+BATCH = 1 << 16
+
+
+def lookup_tables():
+    """
+    Return (founder, child) tables of person factors: founder[genes,
+    trait] for people with unknown parents, and child[genes, trait,
+    mother_genes, father_genes] for the others. Trait index 1 is True.
+    """
+    founder = np.empty((3, 2))
+    child = np.empty((3, 2, 3, 3))
+    for genes in range(3):
+        for trait in (False, True):
+            founder[genes, int(trait)] = person_probability(genes, trait)
+            for mother_genes in range(3):
+                for father_genes in range(3):
+                    child[genes, int(trait), mother_genes, father_genes] = (
+                        person_probability(genes, trait,
+                                           mother_genes, father_genes)
+                    )
+    return founder, child
+
+
+class Evaluator():
+    """
+    Evaluates batches of assignments to the people of a family.
+    """
+
+    def __init__(self, people):
+        # Column of each person in an encoded assignment
+        self.names = list(people)
+        column = {name: i for i, name in enumerate(self.names)}
+        self.founder, self.child = lookup_tables()
+        # Columns of each person's parents, or None
+        self.parents = []
+        for name in self.names:
+            mother = people[name]["mother"]
+            father = people[name]["father"]
+            if mother is None and father is None:
+                self.parents.append(None)
+            else:
+                self.parents.append((column[mother], column[father]))
+
+    def encode(self, one_gene, two_genes, have_trait):
+        """
+        Return the (genes, traits) rows of one assignment given as sets.
+        """
+        genes = [
+            1 if name in one_gene else 2 if name in two_genes else 0
+            for name in self.names
+        ]
+        traits = [name in have_trait for name in self.names]
+        return np.array(genes, dtype=np.int8), np.array(traits, dtype=np.int8)
+
+    def joint_probabilities(self, genes, traits):
+        """
+        Return the joint probability of each assignment, given as K x N
+        arrays of gene counts and traits (0 or 1) in column order.
+        """
+        joint = np.ones(len(genes))
+        for i, parents in enumerate(self.parents):
+            if parents is None:
+                factor = self.founder[genes[:, i], traits[:, i]]
+            else:
+                mother, father = parents
+                factor = self.child[genes[:, i], traits[:, i],
+                                    genes[:, mother], genes[:, father]]
+            joint *= factor
+        return joint
+
+    def log_joint_probabilities(self, genes, traits):
+        """
+        Return the log of `joint_probabilities`, adding the logs of each
+        person's factors.
+        """
+        log_joint = np.zeros(len(genes))
+        with np.errstate(divide="ignore"):
+            founder = np.log(self.founder)
+            child = np.log(self.child)
+        for i, parents in enumerate(self.parents):
+            if parents is None:
+                log_joint += founder[genes[:, i], traits[:, i]]
+            else:
+                mother, father = parents
+                log_joint += child[genes[:, i], traits[:, i],
+                                   genes[:, mother], genes[:, father]]
+        return log_joint
+
+
+def log_bincount(codes, log_weights, length):
+    """
+    Return, for each code below `length`, the log of the summed
+    exp(`log_weights`) of the entries with that code.
+    """
+    totals = np.full(length, -np.inf)
+    for code in range(length):
+        selected = log_weights[codes == code]
+        if len(selected):
+            totals[code] = np.logaddexp.reduce(selected)
+    return totals
+
+
+def assignments(people, batch=BATCH):
+    """
+    Yield (genes, traits) batches of every assignment consistent with
+    the known traits, as K x N arrays in `people` order. Assignment k's
+    gene counts are the base-3 digits of k // 2^U and the unknown traits
+    the bits of k % 2^U, where U is the number of unknown traits.
+    """
+    names = list(people)
+    known = np.array([
+        -1 if people[name]["trait"] is None else int(people[name]["trait"])
+        for name in names
+    ])
+    unknown = np.flatnonzero(known < 0)
+    count = 3 ** len(names) * 2 ** len(unknown)
+    for start in range(0, count, batch):
+        index = np.arange(start, min(count, start + batch), dtype=np.int64)
+        traits = np.tile(np.maximum(known, 0).astype(np.int8),
+                         (len(index), 1))
+        for bit, column in enumerate(unknown):
+            traits[:, column] = (index >> bit) & 1
+        codes = index >> len(unknown)
+        genes = np.empty((len(index), len(names)), dtype=np.int8)
+        for column in range(len(names)):
+            codes, genes[:, column] = np.divmod(codes, 3)
+        yield genes, traits
+
+
+def vectorized_probabilities(people, batch=BATCH, log_space=False):
+    """
+    Return each person's normalized gene and trait probabilities, as
+    `heredity.enumerate_probabilities` does, evaluating assignments in
+    batches of `batch`, in log space if `log_space` is set.
+    """
+    evaluator = Evaluator(people)
+    if log_space:
+        gene_totals = np.full((len(people), 3), -np.inf)
+        trait_totals = np.full((len(people), 2), -np.inf)
+    else:
+        gene_totals = np.zeros((len(people), 3))
+        trait_totals = np.zeros((len(people), 2))
+    for genes, traits in assignments(people, batch):
+        if log_space:
+            log_joint = evaluator.log_joint_probabilities(genes, traits)
+            for i in range(len(people)):
+                gene_totals[i] = np.logaddexp(
+                    gene_totals[i], log_bincount(genes[:, i], log_joint, 3)
+                )
+                trait_totals[i] = np.logaddexp(
+                    trait_totals[i], log_bincount(traits[:, i], log_joint, 2)
+                )
+            continue
+        joint = evaluator.joint_probabilities(genes, traits)
+        for i in range(len(people)):
+            gene_totals[i] += np.bincount(genes[:, i], joint, minlength=3)
+            trait_totals[i] += np.bincount(traits[:, i], joint, minlength=2)
+
+    probabilities = empty_probabilities(people)
+    for i, name in enumerate(evaluator.names):
+        for genes in range(3):
+            probabilities[name]["gene"][genes] = float(gene_totals[i, genes])
+        for trait in (True, False):
+            probabilities[name]["trait"][trait] = float(
+                trait_totals[i, int(trait)]
+            )
+    if log_space:
+        return log_normalize(probabilities)
+    normalize(probabilities)
+    return probabilities
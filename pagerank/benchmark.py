@@ -0,0 +1,586 @@
+"""
+Benchmarks for the pagerank project.
+
+Usage: python benchmark.py <benchmark> [options]
+Run `python benchmark.py -h` for the list of benchmarks.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import resource
+import tempfile
+import time
+
+import numpy as np
+import scipy.sparse
+
+import pagerank
+from crawler import cache_path, crawl_links
+from matrix import (SOLVERS, LinkMatrix, build_link_matrix, corpus_diff,
+                    personalized_pagerank, power_iterate, solve,
+                    sparse_pagerank, update_pagerank)
+from outofcore import BLOCK, EdgeStore, outofcore_pagerank, write_store
+from sampling import fast_sample_pagerank, parallel_sample_pagerank
+
+
+def random_corpus(pages, links, seed=0):
+    """
+    Return a corpus of `pages` pages named like HTML files, each linking
+    to up to `links` other random pages (some to none at all).
+    """
+    rng = random.Random(seed)
+    names = [f"{i}.html" for i in range(pages)]
+    corpus = dict()
+    for name in names:
+        count = rng.randint(0, 2 * links)
+        corpus[name] = set(rng.sample(names, min(count, pages))) - {name}
+    return corpus
+
+
+def timed(function, *args):
+    """
+    Return (result, seconds) for calling `function(*args)`.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def max_difference(a, b):
+    """
+    Return the largest difference between two rank dictionaries.
+    """
+    return max(abs(a[page] - b[page]) for page in a)
+
+
+def write_html(corpus, directory):
+    """
+    Write `corpus` to `directory` as HTML pages with padding text, one
+    anchor per link.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for page, links in corpus.items():
+        with open(os.path.join(directory, page), "w") as f:
+            f.write(f"<html><body><h1>{page}</h1>\n")
+            for link in sorted(links):
+                f.write("<p>" + "Lorem ipsum dolor sit amet. " * 20 + "</p>\n")
+                f.write(f'<a class="link" href="{link}">{link}</a>\n')
+            f.write("</body></html>\n")
+
+
+def bench_crawl(args):
+    """
+    Compare `crawl` with the parallel crawler, parsing everything and
+    then through its link cache after a few files change.
+    """
+    corpus = random_corpus(args.pages, args.links, args.seed)
+    if not os.path.exists(os.path.join(args.directory, "0.html")):
+        write_html(corpus, args.directory)
+    serial, seconds = timed(pagerank.crawl, args.directory)
+    print(f"{'crawl':<20} {seconds:>8.3f} s")
+
+    (parallel, parsed), seconds = timed(
+        lambda: crawl_links(args.directory, args.processes, rebuild=True)
+    )
+    print(f"{'parallel':<20} {seconds:>8.3f} s  {parsed} files parsed")
+    (cached, parsed), seconds = timed(
+        lambda: crawl_links(args.directory, args.processes)
+    )
+    print(f"{'cached':<20} {seconds:>8.3f} s  {parsed} files parsed")
+
+    # Touch 1% of the files so the cache has to parse them again
+    for i in range(0, args.pages, 100):
+        os.utime(os.path.join(args.directory, f"{i}.html"))
+    (changed, parsed), seconds = timed(
+        lambda: crawl_links(args.directory, args.processes)
+    )
+    print(f"{'cached, 1% changed':<20} {seconds:>8.3f} s  "
+          f"{parsed} files parsed")
+    print(f"cache size {os.path.getsize(cache_path(args.directory))} bytes, "
+          f"results match: {serial == parallel == cached == changed}")
+
+
+def bench_iterate(args):
+    """
+    Compare `iterate_pagerank` with the sparse engine on random corpora.
+    """
+    print(f"{'pages':>8} {'loop s':>10} {'sparse s':>10} {'speedup':>8} "
+          f"{'max diff':>10}")
+    for pages in args.pages:
+        corpus = random_corpus(pages, args.links, args.seed)
+        sparse, sparse_seconds = timed(sparse_pagerank, corpus, args.damping)
+        # The loop engine is quadratic per iteration
+        if pages > args.loop_pages:
+            print(f"{pages:>8} {'-':>10} {sparse_seconds:>10.3f}")
+            continue
+        loop, loop_seconds = timed(
+            pagerank.iterate_pagerank, corpus, args.damping
+        )
+        print(f"{pages:>8} {loop_seconds:>10.3f} {sparse_seconds:>10.3f} "
+              f"{loop_seconds / sparse_seconds:>8.1f} "
+              f"{max_difference(loop, sparse):>10.2e}")
+
+
+def bench_solvers(args):
+    """
+    Compare the sparse solvers' iterations, time and accuracy against
+    power iteration run to a much tighter tolerance.
+    """
+    print(f"{'pages':>8} {'solver':<14} {'iters':>6} {'seconds':>9} "
+          f"{'max diff':>10}")
+    for pages in args.pages:
+        links = build_link_matrix(random_corpus(pages, args.links, args.seed))
+        exact, _ = power_iterate(links, args.damping, tolerance=1e-12)
+        for method in args.methods:
+            (ranks, residuals), seconds = timed(
+                solve, links, args.damping, method
+            )
+            print(f"{pages:>8} {method:<14} {len(residuals):>6} "
+                  f"{seconds:>9.3f} {np.abs(ranks - exact).max():>10.2e}")
+
+
+def bench_personalized(args):
+    """
+    Compare solving a batch of personalized PageRank vectors together
+    with solving them one at a time.
+    """
+    print(f"{'pages':>8} {'topics':>7} {'batch s':>9} {'single s':>9} "
+          f"{'speedup':>8} {'max diff':>10}")
+    rng = random.Random(args.seed)
+    for pages in args.pages:
+        corpus = random_corpus(pages, args.links, args.seed)
+        names = sorted(corpus)
+        topics = [rng.sample(names, args.seeds) for _ in range(args.topics)]
+        batch, batch_seconds = timed(
+            personalized_pagerank, corpus, args.damping, topics
+        )
+        single, single_seconds = timed(lambda: [
+            personalized_pagerank(corpus, args.damping, [topic])[0]
+            for topic in topics
+        ])
+        difference = max(max_difference(a, b) for a, b in zip(batch, single))
+        print(f"{pages:>8} {args.topics:>7} {batch_seconds:>9.3f} "
+              f"{single_seconds:>9.3f} "
+              f"{single_seconds / batch_seconds:>8.1f} {difference:>10.2e}")
+
+
+# Synthetic link graphs `edge_blocks` can generate
+GRAPHS = ["random", "power-law", "chain", "star", "dangling"]
+
+# Share of pages with no links in "dangling" graphs
+DANGLING_SHARE = 0.5
+
+
+def edge_blocks(graph, pages, links, seed=0):
+    """
+    Yield (sources, targets) blocks of the links of a synthetic graph
+    over page indices, a range of pages at a time, so graphs too large
+    for memory can be streamed. `graph` is one of `GRAPHS`:
+        * "random": each page links to up to 2 * `links` random pages,
+        * "power-law": as random, but links favour low-index pages so
+          in-link counts follow a power law,
+        * "chain": page i links to page i + 1 only,
+        * "star": page 0 links to every page and every page links back,
+        * "dangling": as random, but DANGLING_SHARE of pages link nowhere.
+    """
+    rng = np.random.default_rng(seed)
+    block_pages = max(1, BLOCK // (2 * links))
+    for start in range(0, pages, block_pages):
+        ids = np.arange(start, min(pages, start + block_pages),
+                        dtype=np.int64)
+        if graph == "chain":
+            sources = ids[ids + 1 < pages]
+            yield sources, sources + 1
+            continue
+        if graph == "star":
+            leaves = ids[ids > 0]
+            hub = np.zeros(len(leaves), dtype=np.int64)
+            yield (np.concatenate((leaves, hub)),
+                   np.concatenate((hub, leaves)))
+            continue
+
+        counts = rng.integers(0, 2 * links + 1, len(ids))
+        if graph == "dangling":
+            counts[rng.random(len(ids)) < DANGLING_SHARE] = 0
+        sources = np.repeat(ids, counts)
+        if graph == "power-law":
+            # P(target < x) = (x / pages) ** (1 / 3)
+            targets = (pages * rng.random(len(sources)) ** 3).astype(np.int64)
+        else:
+            targets = rng.integers(0, pages, len(sources))
+        # Drop repeated links and links to the page itself
+        keys = np.sort(sources * pages + targets)
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))]
+        sources, targets = keys // pages, keys % pages
+        keep = sources != targets
+        yield sources[keep], targets[keep]
+
+
+def bench_outofcore(args):
+    """
+    Build an edge store of a random graph and iterate it out of core,
+    checking the ranks against the sparse engine on small graphs.
+    """
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        _, build_seconds = timed(
+            write_store, directory, args.pages,
+            edge_blocks("random", args.pages, args.links, args.seed)
+        )
+        store = EdgeStore(directory)
+        (ranks, residuals), seconds = timed(
+            outofcore_pagerank, store, args.damping
+        )
+        print(f"{args.pages} pages, {store.edge_count} links: build "
+              f"{build_seconds:.2f} s, {len(residuals)} iterations "
+              f"{seconds:.2f} s, peak RSS {rss_mib():.0f} MiB")
+        if args.pages <= args.check_pages:
+            corpus = {
+                str(i): set() for i in range(args.pages)
+            }
+            for sources, targets in store.edge_blocks():
+                for source, target in zip(sources, targets):
+                    corpus[str(source)].add(str(target))
+            exact = sparse_pagerank(corpus, args.damping)
+            difference = max(
+                abs(exact[str(i)] - ranks[i]) for i in range(args.pages)
+            )
+            print(f"max diff vs sparse engine {difference:.2e}")
+
+
+def rss_mib():
+    """
+    Return this process's peak resident set size in MiB.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def blocks_to_corpus(pages, blocks):
+    """
+    Return the corpus dictionary, as `pagerank.crawl` would, of a graph
+    given as edge blocks, naming page i "i.html".
+    """
+    names = [f"{i}.html" for i in range(pages)]
+    corpus = {name: set() for name in names}
+    for sources, targets in blocks:
+        for source, target in zip(sources.tolist(), targets.tolist()):
+            corpus[names[source]].add(names[target])
+    return corpus
+
+
+def blocks_to_matrix(pages, blocks):
+    """
+    Return the `LinkMatrix` of a graph given as edge blocks, built
+    straight from the index arrays.
+    """
+    blocks = list(blocks)
+    sources = np.concatenate([block[0] for block in blocks])
+    targets = np.concatenate([block[1] for block in blocks])
+    degrees = np.bincount(sources, minlength=pages)
+    matrix = scipy.sparse.csr_matrix(
+        (1 / degrees[sources], (targets, sources)), shape=(pages, pages)
+    )
+    return LinkMatrix(range(pages), matrix, degrees == 0)
+
+
+def rank_array(ranks, pages):
+    """
+    Return ranks keyed by "i.html" names as an array indexed by i.
+    """
+    array = np.zeros(pages)
+    for name, rank in ranks.items():
+        array[int(name[:-len(".html")])] = rank
+    return array
+
+
+def suite_cases(args, graph, pages):
+    """
+    Yield (method, run) for every method to time on a graph of `pages`
+    pages, where `run()` returns (ranks or None, iterations or None).
+    Methods are skipped above the size limits in `args`; "outofcore"
+    includes writing its edge store.
+    """
+    def blocks():
+        return edge_blocks(graph, pages, args.links, args.seed)
+
+    # The crawl and loop methods start from the dictionary corpus too,
+    # whatever their own limits
+    if pages <= max(args.dict_pages, args.crawl_pages, args.loop_pages):
+        corpus = blocks_to_corpus(pages, blocks())
+    if pages <= args.crawl_pages:
+        with tempfile.TemporaryDirectory() as directory:
+            write_html(corpus, directory)
+
+            def crawl():
+                pagerank.crawl(directory)
+                return None, None
+
+            def crawl_parallel():
+                crawl_links(directory, args.processes, cache=False)
+                return None, None
+
+            yield "crawl", crawl
+            yield "crawl-parallel", crawl_parallel
+    if pages <= args.loop_pages:
+        yield "sample", lambda: (pagerank.sample_pagerank(
+            corpus, args.damping, args.transition_samples), None)
+        yield "iterate", lambda: (
+            pagerank.iterate_pagerank(corpus, args.damping), None
+        )
+    if pages <= args.dict_pages:
+        yield "sample-fast", lambda: (fast_sample_pagerank(
+            corpus, args.damping, args.samples, args.seed), None)
+        yield "sample-parallel", lambda: (parallel_sample_pagerank(
+            corpus, args.damping, args.samples, processes=args.processes,
+            seed=args.seed)[0], None)
+        yield "sparse", lambda: (sparse_pagerank(corpus, args.damping), None)
+    if pages <= args.sparse_pages:
+        links = blocks_to_matrix(pages, blocks())
+        for method in SOLVERS:
+            def run(method=method):
+                ranks, residuals = solve(links, args.damping, method)
+                return ranks, len(residuals)
+            yield f"sparse-{method}", run
+    if pages <= args.outofcore_pages:
+        def run():
+            with tempfile.TemporaryDirectory() as directory:
+                write_store(directory, pages, blocks())
+                ranks, residuals = outofcore_pagerank(
+                    EdgeStore(directory), args.damping
+                )
+                return np.array(ranks), len(residuals)
+        yield "outofcore", run
+
+
+def bench_suite(args):
+    """
+    Time every engine on synthetic graphs of each kind and size, with
+    the largest rank difference from tightly converged power iteration.
+    Results are printed and optionally written as CSV and JSON.
+    """
+    results = []
+    print(f"{'graph':<10} {'pages':>9} {'method':<20} {'seconds':>9} "
+          f"{'iters':>6} {'max diff':>10}")
+    for graph in args.graphs:
+        for pages in args.pages:
+            exact = None
+            if pages <= args.sparse_pages:
+                links = blocks_to_matrix(
+                    pages, edge_blocks(graph, pages, args.links, args.seed)
+                )
+                exact, _ = power_iterate(links, args.damping,
+                                         tolerance=1e-12)
+            for method, run in suite_cases(args, graph, pages):
+                (ranks, iterations), seconds = timed(run)
+                difference = None
+                if exact is not None and ranks is not None:
+                    if isinstance(ranks, dict):
+                        ranks = rank_array(ranks, pages)
+                    difference = float(np.abs(ranks - exact).max())
+                results.append({
+                    "graph": graph, "pages": pages, "method": method,
+                    "seconds": seconds, "iterations": iterations,
+                    "max_diff": difference,
+                })
+                print(f"{graph:<10} {pages:>9} {method:<20} {seconds:>9.3f} "
+                      f"{'-' if iterations is None else iterations:>6} "
+                      f"{'-' if difference is None else f'{difference:.2e}':>10}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+
+def bench_sample(args):
+    """
+    Compare `sample_pagerank` with the O(1)-per-step sampler, measuring
+    accuracy against the sparse engine's ranks.
+    """
+    print(f"{'pages':>8} {'sampler':<12} {'samples':>10} {'seconds':>10} "
+          f"{'us/sample':>10} {'max diff':>10}")
+    for pages in args.pages:
+        corpus = random_corpus(pages, args.links, args.seed)
+        exact = sparse_pagerank(corpus, args.damping)
+        cases = [
+            ("transition", pagerank.sample_pagerank,
+             min(args.samples, args.transition_samples)),
+            ("fast", fast_sample_pagerank, args.samples),
+        ]
+        for name, sampler, samples in cases:
+            ranks, seconds = timed(sampler, corpus, args.damping, samples)
+            print(f"{pages:>8} {name:<12} {samples:>10} {seconds:>10.3f} "
+                  f"{seconds / samples * 1e6:>10.2f} "
+                  f"{max_difference(exact, ranks):>10.2e}")
+
+
+def perturb(corpus, fraction, rng):
+    """
+    Return a copy of `corpus` where about `fraction` of the pages were
+    re-crawled: some removed, some added, the rest with new links.
+    """
+    names = sorted(corpus)
+    changed = rng.sample(names, max(1, int(len(names) * fraction)))
+    new = {page: set(links) for page, links in corpus.items()}
+    for i, page in enumerate(changed):
+        if i % 4 == 0:
+            del new[page]
+        elif i % 4 == 1:
+            new[f"new-{page}"] = set(rng.sample(names, 3))
+        else:
+            new[page] = set(rng.sample(names, len(corpus[page]) or 1))
+    for page in new:
+        new[page] = {link for link in new[page] if link in new} - {page}
+    return new
+
+
+def bench_incremental(args):
+    """
+    Compare warm-started and cold PageRank iteration after a re-crawl
+    that changed a small fraction of the corpus.
+    """
+    rng = random.Random(args.seed)
+    print(f"{'pages':>8} {'changed':>8} {'warm it':>8} {'cold it':>8} "
+          f"{'saved':>6} {'warm s':>8} {'cold s':>8} {'max diff':>10}")
+    for pages in args.pages:
+        corpus = random_corpus(pages, args.links, args.seed)
+        ranks = sparse_pagerank(corpus, args.damping)
+        new = perturb(corpus, args.fraction, rng)
+        diff = corpus_diff(corpus, new)
+        (_, warm, report), warm_seconds = timed(
+            update_pagerank, corpus, ranks, diff, args.damping
+        )
+        cold, cold_seconds = timed(sparse_pagerank, new, args.damping)
+        _, _, report = update_pagerank(corpus, ranks, diff, args.damping,
+                                       compare=True)
+        print(f"{pages:>8} {args.fraction:>8.0%} {report['iterations']:>8} "
+              f"{report['cold_iterations']:>8} {report['saved']:>6} "
+              f"{warm_seconds:>8.3f} {cold_seconds:>8.3f} "
+              f"{max_difference(cold, warm):>10.2e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks for pagerank.")
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+
+    crawl = benchmarks.add_parser(
+        "crawl", help="crawl vs the parallel, cached crawler")
+    crawl.add_argument("directory",
+                       help="corpus directory, written if it has no pages")
+    crawl.add_argument("--pages", type=int, default=20000)
+    crawl.add_argument("--links", type=int, default=5)
+    crawl.add_argument("--processes", type=int)
+    crawl.add_argument("--seed", type=int, default=0)
+    crawl.set_defaults(run=bench_crawl)
+
+    iterate = benchmarks.add_parser(
+        "iterate", help="iterate_pagerank vs the sparse engine")
+    iterate.add_argument("--pages", type=int, nargs="+",
+                         default=[100, 1000, 100000])
+    iterate.add_argument("--links", type=int, default=5,
+                         help="average links per page")
+    iterate.add_argument("--loop-pages", type=int, default=1000,
+                         help="largest corpus to run iterate_pagerank on")
+    iterate.add_argument("--damping", type=float, default=pagerank.DAMPING)
+    iterate.add_argument("--seed", type=int, default=0)
+    iterate.set_defaults(run=bench_iterate)
+
+    solvers = benchmarks.add_parser(
+        "solvers", help="convergence of the sparse solvers")
+    solvers.add_argument("--pages", type=int, nargs="+",
+                         default=[1000, 100000, 1000000])
+    solvers.add_argument("--links", type=int, default=5)
+    solvers.add_argument("--methods", nargs="+", choices=list(SOLVERS),
+                         default=list(SOLVERS))
+    solvers.add_argument("--damping", type=float, default=pagerank.DAMPING)
+    solvers.add_argument("--seed", type=int, default=0)
+    solvers.set_defaults(run=bench_solvers)
+
+    personalized = benchmarks.add_parser(
+        "personalized", help="batched vs one-at-a-time personalized ranks")
+    personalized.add_argument("--pages", type=int, nargs="+",
+                              default=[1000, 100000])
+    personalized.add_argument("--links", type=int, default=5)
+    personalized.add_argument("--topics", type=int, default=16)
+    personalized.add_argument("--seeds", type=int, default=10,
+                              help="seed pages per topic")
+    personalized.add_argument("--damping", type=float,
+                              default=pagerank.DAMPING)
+    personalized.add_argument("--seed", type=int, default=0)
+    personalized.set_defaults(run=bench_personalized)
+
+    outofcore = benchmarks.add_parser(
+        "outofcore", help="memory-mapped PageRank on a random graph")
+    outofcore.add_argument("--pages", type=int, default=1000000)
+    outofcore.add_argument("--links", type=int, default=5)
+    outofcore.add_argument("--check-pages", type=int, default=100000,
+                           help="largest graph to check against the "
+                                "sparse engine")
+    outofcore.add_argument("--directory",
+                           help="where to put the store (default: temp)")
+    outofcore.add_argument("--damping", type=float, default=pagerank.DAMPING)
+    outofcore.add_argument("--seed", type=int, default=0)
+    outofcore.set_defaults(run=bench_outofcore)
+
+    suite = benchmarks.add_parser(
+        "suite", help="every engine on synthetic graphs, to CSV/JSON")
+    suite.add_argument("--graphs", nargs="+", choices=GRAPHS, default=GRAPHS)
+    suite.add_argument("--pages", type=int, nargs="+",
+                       default=[1000, 10000, 100000],
+                       help="graph sizes; up to 10M pages is practical")
+    suite.add_argument("--links", type=int, default=5)
+    suite.add_argument("--samples", type=int, default=100000)
+    suite.add_argument("--transition-samples", type=int, default=1000)
+    suite.add_argument("--processes", type=int)
+    suite.add_argument("--crawl-pages", type=int, default=10000,
+                       help="largest graph written out as HTML and crawled")
+    suite.add_argument("--loop-pages", type=int, default=1000,
+                       help="largest graph for sample_pagerank and "
+                            "iterate_pagerank")
+    suite.add_argument("--dict-pages", type=int, default=100000,
+                       help="largest graph built as a corpus dictionary")
+    suite.add_argument("--sparse-pages", type=int, default=2000000,
+                       help="largest graph for the in-memory sparse "
+                            "solvers, also used as the reference")
+    suite.add_argument("--outofcore-pages", type=int, default=10000000)
+    suite.add_argument("--csv", help="write results to this CSV file")
+    suite.add_argument("--json", help="write results to this JSON file")
+    suite.add_argument("--damping", type=float, default=pagerank.DAMPING)
+    suite.add_argument("--seed", type=int, default=0)
+    suite.set_defaults(run=bench_suite)
+
+    sample = benchmarks.add_parser(
+        "sample", help="sample_pagerank vs the O(1)-per-step sampler")
+    sample.add_argument("--pages", type=int, nargs="+", default=[100, 10000])
+    sample.add_argument("--links", type=int, default=5)
+    sample.add_argument("--samples", type=int, default=1000000)
+    sample.add_argument("--transition-samples", type=int, default=10000,
+                        help="sample cap for sample_pagerank, which is "
+                             "O(pages) per sample")
+    sample.add_argument("--damping", type=float, default=pagerank.DAMPING)
+    sample.add_argument("--seed", type=int, default=0)
+    sample.set_defaults(run=bench_sample)
+
+    incremental = benchmarks.add_parser(
+        "incremental", help="warm-started vs cold iteration after a re-crawl")
+    incremental.add_argument("--pages", type=int, nargs="+",
+                             default=[1000, 100000])
+    incremental.add_argument("--links", type=int, default=5)
+    incremental.add_argument("--fraction", type=float, default=0.03,
+                             help="fraction of pages changed by the re-crawl")
+    incremental.add_argument("--damping", type=float,
+                             default=pagerank.DAMPING)
+    incremental.add_argument("--seed", type=int, default=0)
+    incremental.set_defaults(run=bench_incremental)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Parallel, streaming crawler with an on-disk link cache.
+
+Each HTML file is read in chunks and scanned with the same regex as
+`pagerank.crawl`, with files spread over a process pool. The raw links
+of every file are written to a compact edge list in the corpus
+directory: a table of link names and an int array of indices into it,
+behind a JSON header recording each file's mtime and size. Later crawls
+only parse files whose mtime or size changed. Links are stored before
+filtering, so the cache stays valid as pages come and go, and are
+filtered against the corpus when it is loaded.
+"""
+import json
+import os
+import re
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+CACHE_NAME = ".pagerank-links"
+CACHE_VERSION = 1
+MAGIC = b"PRLINKS\0"
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Characters read from a file per chunk
+CHUNK_CHARS = 1 << 20
+
+# Characters of each chunk scanned again with the next one, so links
+# cut by a chunk boundary are still found; tags longer than this that
+# straddle a boundary are missed
+OVERLAP_CHARS = 1 << 12
+
+# Parse fewer files than this without starting a process pool
+PARALLEL_FILES = 64
+
+
+def cache_path(directory):
+    return os.path.join(directory, CACHE_NAME)
+
+
+def parse_links(path):
+    """
+    Return the set of link targets in the HTML file at `path`, reading
+    it in chunks rather than whole.
+    """
+    links = set()
+    tail = ""
+    with open(path) as f:
+        while True:
+            chunk = f.read(CHUNK_CHARS)
+            if not chunk:
+                break
+            text = tail + chunk
+            links.update(LINK.findall(text))
+            tail = text[-OVERLAP_CHARS:]
+    return links
+
+
+def html_files(directory):
+    """
+    Return {filename: [mtime_ns, size]} for the HTML files in `directory`.
+    """
+    files = dict()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.endswith(".html") and entry.is_file():
+                stat = entry.stat()
+                files[entry.name] = [stat.st_mtime_ns, stat.st_size]
+    return files
+
+
+def write_cache(path, files, links):
+    """
+    Write the raw `links` of each file in `files` (as returned by
+    `html_files`) to a link cache at `path`.
+    """
+    names = []
+    ids = dict()
+    targets = array("i")
+    entries = dict()
+    for filename, signature in files.items():
+        start = len(targets)
+        for link in links[filename]:
+            if link not in ids:
+                ids[link] = len(names)
+                names.append(link)
+            targets.append(ids[link])
+        entries[filename] = signature + [start, len(targets) - start]
+
+    header = json.dumps({
+        "version": CACHE_VERSION,
+        "byteorder": sys.byteorder,
+        "itemsize": targets.itemsize,
+        "files": entries,
+        "names": len(names),
+        "targets": len(targets),
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)
+
+    # Write to a temporary file first so readers never see half a cache
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(targets.tobytes())
+        f.write("\0".join(names).encode("utf-8"))
+    os.replace(temporary, path)
+
+
+def read_cache(path):
+    """
+    Return {filename: (signature, links)} from the link cache at `path`,
+    or an empty dictionary if it is missing or from another version or
+    platform.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return dict()
+    if not data.startswith(MAGIC):
+        return dict()
+    try:
+        (length,) = struct.unpack_from("<I", data, len(MAGIC))
+        start = len(MAGIC) + 4
+        header = json.loads(data[start:start + length])
+    except (struct.error, ValueError):
+        return dict()
+    if (header.get("version") != CACHE_VERSION or
+            header.get("byteorder") != sys.byteorder or
+            header.get("itemsize") != struct.calcsize("i")):
+        return dict()
+
+    start += length
+    end = start + header["targets"] * header["itemsize"]
+    targets = memoryview(data)[start:end].cast("i")
+    names = data[end:].decode("utf-8").split("\0") if header["names"] else []
+    cached = dict()
+    for filename, (mtime, size, first, count) in header["files"].items():
+        links = {names[i] for i in targets[first:first + count]}
+        cached[filename] = ([mtime, size], links)
+    return cached
+
+
+def parse_files(directory, filenames, processes=None):
+    """
+    Return {filename: links} for `filenames` in `directory`, parsing
+    them over a pool of `processes` when there are many.
+    """
+    paths = [os.path.join(directory, filename) for filename in filenames]
+    if processes == 1 or len(paths) < PARALLEL_FILES:
+        return dict(zip(filenames, map(parse_links, paths)))
+    # Batch small files so each task is worth sending
+    chunksize = max(1, len(paths) // (4 * (processes or os.cpu_count() or 1)))
+    with ProcessPoolExecutor(processes) as pool:
+        return dict(zip(filenames,
+                        pool.map(parse_links, paths, chunksize=chunksize)))
+
+
+def crawl_links(directory, processes=None, cache=True, rebuild=False):
+    """
+    Parse a directory of HTML pages like `pagerank.crawl`, in parallel
+    and through the link cache unless `cache` is False. With `rebuild`,
+    every file is parsed again.
+
+    Return (corpus, parsed) where `corpus` is the same dictionary
+    `pagerank.crawl` returns and `parsed` the number of files parsed.
+    """
+    files = html_files(directory)
+    cached = read_cache(cache_path(directory)) if cache and not rebuild else {}
+    links = dict()
+    stale = []
+    for filename, signature in files.items():
+        entry = cached.get(filename)
+        if entry is not None and entry[0] == signature:
+            links[filename] = entry[1]
+        else:
+            stale.append(filename)
+    links.update(parse_files(directory, stale, processes))
+
+    if cache and (stale or len(cached) != len(files)):
+        try:
+            write_cache(cache_path(directory), files, links)
+        except OSError as e:
+            print(f"Could not write link cache: {e}", file=sys.stderr)
+
+    # Only include links to other pages in the corpus
+    corpus = {
+        filename: {
+            link for link in page_links if link in files and link != filename
+        }
+        for filename, page_links in links.items()
+    }
+    return corpus, len(stale)
@@ -0,0 +1,422 @@
+"""
+Sparse-matrix PageRank engine.
+
+The corpus is turned once into a CSR matrix `M` with M[i, j] = 1 / L(j)
+for every link j -> i, where L(j) is the number of links on page j, plus
+a mask of pages with no links. Each iteration is then one sparse
+mat-vec product instead of a scan over every pair of pages:
+
+    PR = (1 - d) / N + d * (M @ PR + sum(PR[dangling]) / N)
+
+which is the update `pagerank.iterate_pagerank` applies, pages with no
+links counting as linking to every page (themselves included).
+
+Besides plain power iteration, `solve` offers Gauss-Seidel sweeps,
+periodic Aitken extrapolation and adaptive iteration that stops
+recomputing pages once they have converged. `personalized_pagerank`
+solves a batch of teleport distributions at once, as the columns of
+one matrix, so each iteration reads the link matrix once for all.
+"""
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+# Stop once no page's rank changes by this much, as in iterate_pagerank
+CONVERGE_SCALE = 0.00001
+
+# Give up on iterations that haven't converged after this many rounds
+MAX_ITERATIONS = 10000
+
+# Power iterations between Aitken extrapolations
+AITKEN_PERIOD = 10
+
+# Iterations a page must stay within tolerance before adaptive iteration
+# freezes it, and iterations between its full sweeps over every page
+ADAPTIVE_FREEZE = 3
+ADAPTIVE_PERIOD = 10
+
+
+class LinkMatrix():
+    """
+    Column-stochastic link structure of a corpus.
+    """
+
+    def __init__(self, pages, matrix, dangling):
+        # Page name at each index, and each page's index
+        self.pages = pages
+        self.index = {page: i for i, page in enumerate(pages)}
+        # CSR matrix with M[i, j] = 1 / L(j) for each link j -> i
+        self.matrix = matrix
+        # Boolean mask of pages with no links
+        self.dangling = dangling
+
+    def __len__(self):
+        return len(self.pages)
+
+    def to_dict(self, ranks):
+        """
+        Return a rank vector as a dictionary keyed by page name.
+        """
+        return {page: float(rank) for page, rank in zip(self.pages, ranks)}
+
+
+def build_link_matrix(corpus):
+    """
+    Build a `LinkMatrix` from a corpus as returned by `pagerank.crawl`.
+    Links to pages outside the corpus are dropped but still count
+    towards their page's number of links, as in `iterate_pagerank`.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    rows = []
+    cols = []
+    weights = []
+    dangling = np.zeros(len(pages), dtype=bool)
+    for page in pages:
+        j = index[page]
+        links = corpus[page]
+        if not links:
+            dangling[j] = True
+            continue
+        weight = 1 / len(links)
+        for link in links:
+            if link in index:
+                rows.append(index[link])
+                cols.append(j)
+                weights.append(weight)
+
+    matrix = scipy.sparse.csr_matrix(
+        (np.array(weights, dtype=np.float64),
+         (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64))),
+        shape=(len(pages), len(pages))
+    )
+    return LinkMatrix(pages, matrix, dangling)
+
+
+def power_iterate(links, damping_factor, start=None,
+                  tolerance=CONVERGE_SCALE, max_iterations=MAX_ITERATIONS):
+    """
+    Run power iteration on `links` from the rank vector `start`
+    (uniform if not given) until no rank changes by `tolerance`.
+
+    Return (ranks, residuals) where `residuals` holds the largest rank
+    change of each iteration.
+    """
+    n = len(links)
+    ranks = np.full(n, 1 / n) if start is None else np.asarray(start, float)
+    teleport = (1 - damping_factor) / n
+    residuals = []
+    for _ in range(max_iterations):
+        dangling_mass = ranks[links.dangling].sum() / n
+        new_ranks = teleport + damping_factor * (
+            links.matrix @ ranks + dangling_mass
+        )
+        residual = float(np.abs(new_ranks - ranks).max())
+        ranks = new_ranks
+        residuals.append(residual)
+        if residual < tolerance:
+            break
+    return ranks, residuals
+
+
+def gauss_seidel(links, damping_factor, start=None,
+                 tolerance=CONVERGE_SCALE, max_iterations=MAX_ITERATIONS):
+    """
+    Like `power_iterate`, but each sweep updates pages in index order
+    using the ranks already updated in the same sweep, as an in-place
+    loop would. A sweep is one sparse triangular solve; the dangling
+    mass is taken from the ranks at the start of the sweep.
+    """
+    n = len(links)
+    ranks = np.full(n, 1 / n) if start is None else np.asarray(start, float)
+    teleport = (1 - damping_factor) / n
+    lower = scipy.sparse.tril(links.matrix, format="csr")
+    upper = scipy.sparse.triu(links.matrix, k=1, format="csr")
+    system = (scipy.sparse.identity(n, format="csr")
+              - damping_factor * lower).tocsr()
+    residuals = []
+    for _ in range(max_iterations):
+        dangling_mass = ranks[links.dangling].sum() / n
+        right = teleport + damping_factor * (upper @ ranks + dangling_mass)
+        new_ranks = scipy.sparse.linalg.spsolve_triangular(
+            system, right, lower=True
+        )
+        residual = float(np.abs(new_ranks - ranks).max())
+        ranks = new_ranks
+        residuals.append(residual)
+        if residual < tolerance:
+            break
+    return ranks / ranks.sum(), residuals
+
+
+def aitken(links, damping_factor, start=None,
+           tolerance=CONVERGE_SCALE, max_iterations=MAX_ITERATIONS,
+           period=AITKEN_PERIOD):
+    """
+    Like `power_iterate`, but every `period` iterations the last three
+    iterates are extrapolated page by page with Aitken's delta-squared
+    process, which cancels the slowest-decaying error term.
+    """
+    n = len(links)
+    ranks = np.full(n, 1 / n) if start is None else np.asarray(start, float)
+    teleport = (1 - damping_factor) / n
+    history = []
+    residuals = []
+    for iteration in range(1, max_iterations + 1):
+        dangling_mass = ranks[links.dangling].sum() / n
+        new_ranks = teleport + damping_factor * (
+            links.matrix @ ranks + dangling_mass
+        )
+        residual = float(np.abs(new_ranks - ranks).max())
+        history = history[-1:] + [ranks]
+        ranks = new_ranks
+        residuals.append(residual)
+        if residual < tolerance:
+            break
+        if iteration % period == 0:
+            older, old = history
+            first = old - older
+            second = ranks - 2 * old + older
+            # Leave pages alone where the differences don't shrink
+            # geometrically enough to extrapolate safely
+            safe = np.abs(second) > 1e-15
+            extrapolated = ranks.copy()
+            extrapolated[safe] = (
+                older[safe] - first[safe] ** 2 / second[safe]
+            )
+            extrapolated = np.clip(extrapolated, 0, None)
+            ranks = extrapolated / extrapolated.sum()
+            history = []
+    return ranks, residuals
+
+
+def adaptive(links, damping_factor, start=None,
+             tolerance=CONVERGE_SCALE, max_iterations=MAX_ITERATIONS,
+             freeze_after=ADAPTIVE_FREEZE, period=ADAPTIVE_PERIOD):
+    """
+    Like `power_iterate`, but a page whose rank has changed by less than
+    `tolerance` for `freeze_after` iterations in a row is frozen and no
+    longer recomputed, so most iterations only multiply the rows of
+    pages still moving. Every `period` iterations, or once every page
+    is frozen, a full sweep recomputes all pages, thawing any that
+    moved again. The iteration ends after two full sweeps in a row
+    within `tolerance`: the first brings frozen pages up to date, and
+    the second checks that doing so moved nothing that depends on them.
+    The residual of an iteration covers the pages recomputed in it.
+    """
+    n = len(links)
+    ranks = np.full(n, 1 / n) if start is None else np.array(start, float)
+    teleport = (1 - damping_factor) / n
+    # Iterations in a row each page has changed by less than `tolerance`
+    settled = np.zeros(n, dtype=np.int64)
+    active = np.arange(n)
+    rows = links.matrix
+    residuals = []
+    # Whether the previous iteration was a full sweep within tolerance
+    swept = False
+    for iteration in range(1, max_iterations + 1):
+        full = len(active) == n
+        dangling_mass = ranks[links.dangling].sum() / n
+        new_ranks = teleport + damping_factor * (rows @ ranks + dangling_mass)
+        change = np.abs(new_ranks - ranks[active])
+        ranks[active] = new_ranks
+        residual = float(change.max())
+        residuals.append(residual)
+        if full and residual < tolerance and swept:
+            break
+        swept = full and residual < tolerance
+        settled[active] = np.where(change < tolerance, settled[active] + 1, 0)
+
+        moving = settled[active] < freeze_after
+        if swept or iteration % period == 0 or not moving.any():
+            active = np.arange(n)
+            rows = links.matrix
+        # Only slice the matrix once enough pages have settled to pay
+        # for the copy
+        elif moving.sum() < 0.75 * len(active):
+            active = active[moving]
+            rows = links.matrix[active]
+    return ranks / ranks.sum(), residuals
+
+
+SOLVERS = {
+    "power": power_iterate,
+    "gauss-seidel": gauss_seidel,
+    "aitken": aitken,
+    "adaptive": adaptive,
+}
+
+
+def solve(links, damping_factor, method="power", start=None,
+          tolerance=CONVERGE_SCALE, max_iterations=MAX_ITERATIONS):
+    """
+    Compute the ranks of `links` with the solver named `method`, one of
+    `SOLVERS`. Return (ranks, residuals) as `power_iterate` does; the
+    number of iterations is `len(residuals)`.
+    """
+    try:
+        solver = SOLVERS[method]
+    except KeyError:
+        raise ValueError(f"Unknown solver {method!r}")
+    return solver(links, damping_factor, start, tolerance, max_iterations)
+
+
+def sparse_pagerank(corpus, damping_factor, method="power"):
+    """
+    Return PageRank values for each page by sparse iteration with the
+    solver named `method`.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    links = build_link_matrix(corpus)
+    ranks, _ = solve(links, damping_factor, method)
+    return links.to_dict(ranks)
+
+
+def teleport_matrix(links, teleports):
+    """
+    Return an N x K matrix whose columns are the `teleports`
+    distributions over the pages of `links`, each normalized to sum to
+    1. A teleport is either a dictionary from page to weight or a
+    collection of seed pages, weighted equally.
+    """
+    columns = np.zeros((len(links), len(teleports)))
+    for k, teleport in enumerate(teleports):
+        if not isinstance(teleport, dict):
+            teleport = dict.fromkeys(teleport, 1)
+        for page, weight in teleport.items():
+            if page not in links.index:
+                raise ValueError(f"Teleport page {page!r} not in corpus")
+            columns[links.index[page], k] = weight
+        total = columns[:, k].sum()
+        if total <= 0:
+            raise ValueError(f"Teleport {k} has no positive weight")
+        columns[:, k] /= total
+    return columns
+
+
+def personalized_pagerank(corpus, damping_factor, teleports,
+                          tolerance=CONVERGE_SCALE,
+                          max_iterations=MAX_ITERATIONS):
+    """
+    Return personalized PageRank values for each of `teleports`, where
+    the surfer jumps to a page drawn from the teleport distribution
+    rather than uniformly, both when not following a link and when on
+    a page with no links. See `teleport_matrix` for their format.
+
+    All distributions are iterated together as the columns of one
+    matrix until no rank in any column changes by `tolerance`.
+    Return a list with a rank dictionary per teleport, in order.
+    """
+    links = build_link_matrix(corpus)
+    teleport = teleport_matrix(links, teleports)
+    ranks = teleport.copy()
+    for _ in range(max_iterations):
+        dangling_mass = ranks[links.dangling].sum(axis=0)
+        new_ranks = (1 - damping_factor) * teleport + damping_factor * (
+            links.matrix @ ranks + teleport * dangling_mass
+        )
+        residual = np.abs(new_ranks - ranks).max()
+        ranks = new_ranks
+        if residual < tolerance:
+            break
+    return [links.to_dict(ranks[:, k]) for k in range(len(teleports))]
+
+
+def topic_pagerank(corpus, damping_factor, topics):
+    """
+    Return topic-sensitive PageRank: a dictionary from each topic in
+    `topics` (a dictionary from topic name to its seed pages) to the
+    ranks personalized on that topic's seeds.
+    """
+    names = list(topics)
+    ranks = personalized_pagerank(
+        corpus, damping_factor, [topics[name] for name in names]
+    )
+    return dict(zip(names, ranks))
+
+
+def corpus_diff(old, new):
+    """
+    Return the link diff that turns corpus `old` into corpus `new`,
+    in the format `apply_diff` takes.
+    """
+    added_pages = {page: set(new[page]) for page in new if page not in old}
+    removed_pages = {page for page in old if page not in new}
+    added_links = []
+    removed_links = []
+    for page in new:
+        if page in old:
+            added_links.extend((page, link) for link in new[page] - old[page])
+            removed_links.extend((page, link) for link in old[page] - new[page])
+    return {
+        "added_pages": added_pages,
+        "removed_pages": removed_pages,
+        "added_links": added_links,
+        "removed_links": removed_links,
+    }
+
+
+def apply_diff(corpus, diff):
+    """
+    Return a copy of `corpus` with a link diff applied. `diff` may hold:
+        * "added_pages": a dictionary of new pages to their links,
+        * "removed_pages": pages to drop, along with links to them,
+        * "added_links" and "removed_links": (page, link) pairs.
+    """
+    removed = set(diff.get("removed_pages", ()))
+    if removed:
+        updated = {
+            page: links - removed
+            for page, links in corpus.items() if page not in removed
+        }
+    else:
+        updated = {page: set(links) for page, links in corpus.items()}
+    added = diff.get("added_pages", dict())
+    for page, links in added.items():
+        updated[page] = set(links)
+    for page, link in diff.get("removed_links", ()):
+        if page in updated:
+            updated[page].discard(link)
+    # Only new links can point outside the corpus; drop those, as
+    # `pagerank.crawl` does
+    for page, links in added.items():
+        updated[page] = {
+            link for link in links if link in updated and link != page
+        }
+    for page, link in diff.get("added_links", ()):
+        if page in updated and link in updated and link != page:
+            updated[page].add(link)
+    return updated
+
+
+def update_pagerank(corpus, previous_ranks, diff, damping_factor,
+                    compare=False):
+    """
+    Recompute PageRank after applying a link `diff` to `corpus`, warm
+    starting the iteration from `previous_ranks` (the ranks for `corpus`).
+    Pages new to the corpus start at 1/N and the start vector is
+    rescaled to sum to 1.
+
+    Return (corpus, ranks, report): the updated corpus, its ranks as a
+    dictionary, and a report with the warm start's "iterations". With
+    `compare`, the report also holds the "cold_iterations" of a uniform
+    start and the iterations "saved" by the warm start.
+    """
+    updated = apply_diff(corpus, diff)
+    links = build_link_matrix(updated)
+    n = len(links)
+    start = np.array([
+        previous_ranks.get(page, 1 / n) for page in links.pages
+    ])
+    start /= start.sum()
+
+    ranks, residuals = power_iterate(links, damping_factor, start)
+    report = {"iterations": len(residuals)}
+    if compare:
+        _, cold = power_iterate(links, damping_factor)
+        report["cold_iterations"] = len(cold)
+        report["saved"] = len(cold) - len(residuals)
+    return updated, links.to_dict(ranks), report
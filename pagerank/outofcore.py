@@ -0,0 +1,251 @@
+"""
+Out-of-core PageRank over memory-mapped arrays.
+
+An edge store is a directory of raw native arrays: the source and
+target page index of every link, sorted by target, and each page's
+number of links, plus a small JSON description and optionally the page
+names. Rank vectors are memory-mapped files in the same directory.
+
+Each iteration streams the edges in fixed-size blocks. Because a block
+covers a contiguous range of targets, the contributions of its links
+are summed with `np.bincount` over just that range, so working memory
+stays proportional to the block size however large the corpus is.
+Building a store streams the edges too, counting-sorting them by target
+on disk.
+"""
+import bisect
+import json
+import os
+
+import numpy as np
+
+from crawler import html_files, parse_links
+from matrix import CONVERGE_SCALE, MAX_ITERATIONS
+
+STORE_VERSION = 1
+
+# Edges (or pages) processed per block
+BLOCK = 1 << 20
+
+
+def store_file(directory, name):
+    return os.path.join(directory, name)
+
+
+def add_counts(counts, values):
+    """
+    Add the number of times each index occurs in `values` to `counts`.
+    """
+    values = np.sort(values)
+    if not len(values):
+        return
+    starts = np.flatnonzero(
+        np.concatenate(([True], values[1:] != values[:-1]))
+    )
+    counts[values[starts]] += np.diff(np.append(starts, len(values)))
+
+
+def write_store(directory, page_count, blocks, pages=None):
+    """
+    Write an edge store for `page_count` pages to `directory` from
+    `blocks`, an iterable of (sources, targets) index arrays holding
+    each link once. `pages` optionally lists the page names by index.
+    """
+    os.makedirs(directory, exist_ok=True)
+    raw_path = store_file(directory, "edges.tmp")
+    degrees = np.memmap(store_file(directory, "degrees.bin"), np.int32,
+                        "w+", shape=(page_count,))
+    cursor = np.memmap(store_file(directory, "cursor.tmp"), np.int64,
+                       "w+", shape=(page_count,))
+
+    # First pass: spill the edges to disk, counting links per page
+    edge_count = 0
+    with open(raw_path, "wb") as f:
+        for sources, targets in blocks:
+            pairs = np.empty((len(sources), 2), np.int32)
+            pairs[:, 0] = sources
+            pairs[:, 1] = targets
+            pairs.tofile(f)
+            add_counts(degrees, pairs[:, 0])
+            add_counts(cursor, pairs[:, 1])
+            edge_count += len(pairs)
+
+    # Turn the in-link counts into each target's first edge position
+    carry = 0
+    for start in range(0, page_count, BLOCK):
+        counts = np.array(cursor[start:start + BLOCK])
+        cursor[start:start + BLOCK] = np.cumsum(counts) - counts + carry
+        carry += int(counts.sum())
+
+    # Second pass: scatter every edge to its place in target order
+    shape = (max(edge_count, 1),)
+    sources_out = np.memmap(store_file(directory, "sources.bin"), np.int32,
+                            "w+", shape=shape)
+    targets_out = np.memmap(store_file(directory, "targets.bin"), np.int32,
+                            "w+", shape=shape)
+    if edge_count:
+        raw = np.memmap(raw_path, np.int32, "r", shape=(edge_count, 2))
+        for start in range(0, edge_count, BLOCK):
+            block = np.array(raw[start:start + BLOCK])
+            block = block[np.argsort(block[:, 1], kind="stable")]
+            targets, first, counts = np.unique(
+                block[:, 1], return_index=True, return_counts=True
+            )
+            within = np.arange(len(block)) - np.repeat(first, counts)
+            positions = np.repeat(cursor[targets], counts) + within
+            sources_out[positions] = block[:, 0]
+            targets_out[positions] = block[:, 1]
+            cursor[targets] += counts
+        del raw
+    for array in (degrees, sources_out, targets_out):
+        array.flush()
+    del cursor
+    os.remove(raw_path)
+    os.remove(store_file(directory, "cursor.tmp"))
+
+    if pages is not None:
+        with open(store_file(directory, "pages.txt"), "w") as f:
+            for page in pages:
+                f.write(page + "\n")
+    with open(store_file(directory, "store.json"), "w") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "pages": page_count,
+            "edges": edge_count,
+            "named": pages is not None,
+        }, f)
+
+
+def store_from_corpus(corpus, directory):
+    """
+    Write a corpus as returned by `pagerank.crawl` to an edge store.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    sources = []
+    targets = []
+    for page in pages:
+        for link in corpus[page]:
+            if link in index:
+                sources.append(index[page])
+                targets.append(index[link])
+    write_store(directory, len(pages), [(sources, targets)], pages)
+
+
+def store_from_crawl(corpus_directory, directory):
+    """
+    Parse a directory of HTML pages straight into an edge store, one
+    file at a time, without building the corpus dictionary.
+    """
+    pages = sorted(html_files(corpus_directory))
+
+    def blocks():
+        sources = []
+        targets = []
+        for i, page in enumerate(pages):
+            for link in parse_links(os.path.join(corpus_directory, page)):
+                j = bisect.bisect_left(pages, link)
+                if j < len(pages) and pages[j] == link and j != i:
+                    sources.append(i)
+                    targets.append(j)
+            if len(sources) >= BLOCK:
+                yield sources, targets
+                sources, targets = [], []
+        yield sources, targets
+
+    write_store(directory, len(pages), blocks(), pages)
+
+
+class EdgeStore():
+    """
+    Memory-mapped edge store written by `write_store`.
+    """
+
+    def __init__(self, directory):
+        with open(store_file(directory, "store.json")) as f:
+            header = json.load(f)
+        if header.get("version") != STORE_VERSION:
+            raise ValueError(f"Unsupported edge store in {directory}")
+        self.directory = directory
+        self.page_count = header["pages"]
+        self.edge_count = header["edges"]
+        self.named = header["named"]
+        shape = (max(self.edge_count, 1),)
+        self.sources = np.memmap(store_file(directory, "sources.bin"),
+                                 np.int32, "r", shape=shape)
+        self.targets = np.memmap(store_file(directory, "targets.bin"),
+                                 np.int32, "r", shape=shape)
+        self.degrees = np.memmap(store_file(directory, "degrees.bin"),
+                                 np.int32, "r", shape=(self.page_count,))
+
+    def __len__(self):
+        return self.page_count
+
+    def edge_blocks(self, size=BLOCK):
+        """
+        Yield (sources, targets) blocks of at most `size` edges, in
+        target order.
+        """
+        for start in range(0, self.edge_count, size):
+            yield (self.sources[start:start + size],
+                   self.targets[start:start + size])
+
+    def rank_vector(self, name):
+        """
+        Return a writable memory-mapped float vector with a rank per page.
+        """
+        return np.memmap(store_file(self.directory, name), np.float64, "w+",
+                         shape=(self.page_count,))
+
+    def to_dict(self, ranks):
+        """
+        Return a rank vector as a dictionary keyed by page name.
+        """
+        if not self.named:
+            raise ValueError("Edge store has no page names")
+        with open(store_file(self.directory, "pages.txt")) as f:
+            return {
+                line.rstrip("\n"): float(rank) for line, rank in zip(f, ranks)
+            }
+
+
+def outofcore_pagerank(store, damping_factor, tolerance=CONVERGE_SCALE,
+                       max_iterations=MAX_ITERATIONS, block=BLOCK):
+    """
+    Run power iteration over an `EdgeStore`, streaming `block` edges or
+    pages at a time, until no rank changes by `tolerance`.
+
+    Return (ranks, residuals) where `ranks` is a memory-mapped vector in
+    the store's directory and `residuals` holds the largest rank change
+    of each iteration.
+    """
+    n = len(store)
+    ranks = store.rank_vector("ranks.bin")
+    new_ranks = store.rank_vector("ranks.next.bin")
+    ranks[:] = 1 / n
+    teleport = (1 - damping_factor) / n
+    residuals = []
+    for _ in range(max_iterations):
+        dangling_mass = 0.0
+        for start in range(0, n, block):
+            dangling = store.degrees[start:start + block] == 0
+            dangling_mass += ranks[start:start + block][dangling].sum()
+        new_ranks[:] = teleport + damping_factor * dangling_mass / n
+
+        for sources, targets in store.edge_blocks(block):
+            weights = ranks[sources] / store.degrees[sources]
+            first = targets[0]
+            sums = np.bincount(targets - first, weights=weights)
+            new_ranks[first:first + len(sums)] += damping_factor * sums
+
+        residual = 0.0
+        for start in range(0, n, block):
+            change = np.abs(new_ranks[start:start + block]
+                            - ranks[start:start + block])
+            residual = max(residual, float(change.max()))
+        ranks, new_ranks = new_ranks, ranks
+        residuals.append(residual)
+        if residual < tolerance:
+            break
+    ranks.flush()
+    return ranks, residuals
@@ -1,24 +1,103 @@
+import argparse
 import os
 import random
 import re
 import sys
+import tempfile
+
+from crawler import crawl_links
+from sampling import fast_sample_pagerank, parallel_sample_pagerank
 
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(description="Compute PageRank.")
+    parser.add_argument("corpus")
+    parser.add_argument("--crawler", choices=["serial", "parallel"],
+                        default="serial",
+                        help="parallel parses files in a process pool and "
+                             "caches their links in the corpus directory")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="parse every file again with --crawler parallel")
+    parser.add_argument("--engine", choices=["loop", "sparse", "outofcore"],
+                        default="loop",
+                        help="iteration engine; sparse and outofcore need "
+                             "numpy and scipy")
+    parser.add_argument("--method",
+                        choices=["power", "gauss-seidel", "aitken",
+                                 "adaptive"],
+                        help="solver for the sparse engine (default power)")
+    parser.add_argument("--personalize", nargs="+", metavar="PAGE",
+                        help="also print PageRank personalized on these "
+                             "pages; needs numpy and scipy")
+    parser.add_argument("--sampler", choices=["transition", "fast", "parallel"],
+                        default="transition",
+                        help="sampling engine; fast draws each step in O(1), "
+                             "parallel runs fast walkers in a process pool")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--walkers", type=int, default=8,
+                        help="independent walkers for the parallel sampler")
+    parser.add_argument("--processes", type=int,
+                        help="pool size for the parallel sampler and crawler")
+    parser.add_argument("--seed", type=int, help="seed for the parallel sampler")
+    parser.add_argument("--tolerance", type=float,
+                        help="stop parallel sampling once every 95%% "
+                             "confidence interval is narrower than this")
+    args = parser.parse_args()
+    if args.method is not None and args.engine != "sparse":
+        parser.error("--method only applies to --engine sparse")
+    if args.crawler == "parallel":
+        corpus, _ = crawl_links(args.corpus, processes=args.processes,
+                                rebuild=args.rebuild_cache)
+    else:
+        corpus = crawl(args.corpus)
+    intervals = None
+    samples = args.samples
+    if args.sampler == "parallel":
+        ranks, intervals, samples = parallel_sample_pagerank(
+            corpus, DAMPING, args.samples, walkers=args.walkers,
+            processes=args.processes, seed=args.seed,
+            tolerance=args.tolerance
+        )
+    elif args.sampler == "fast":
+        ranks = fast_sample_pagerank(corpus, DAMPING, args.samples)
+    else:
+        ranks = sample_pagerank(corpus, DAMPING, args.samples)
+    print(f"PageRank Results from Sampling (n = {samples})")
     for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+        if intervals is None:
+            print(f"  {page}: {ranks[page]:.4f}")
+        else:
+            print(f"  {page}: {ranks[page]:.4f} ± {intervals[page]:.4f}")
+    if args.engine == "outofcore":
+        from outofcore import EdgeStore, outofcore_pagerank, store_from_crawl
+        with tempfile.TemporaryDirectory() as directory:
+            store_from_crawl(args.corpus, directory)
+            store = EdgeStore(directory)
+            ranks, _ = outofcore_pagerank(store, DAMPING)
+            ranks = store.to_dict(ranks)
+    elif args.engine == "sparse":
+        # Imported here so the default engine doesn't need numpy
+        from matrix import sparse_pagerank
+        ranks = sparse_pagerank(corpus, DAMPING, args.method or "power")
+    else:
+        ranks = iterate_pagerank(corpus, DAMPING)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
+    if args.personalize:
+        from matrix import personalized_pagerank
+        try:
+            (ranks,) = personalized_pagerank(corpus, DAMPING,
+                                             [args.personalize])
+        except ValueError as e:
+            sys.exit(e)
+        print(f"PageRank Results Personalized on "
+              f"{', '.join(args.personalize)}")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
 
 
 def crawl(directory):
@@ -0,0 +1,170 @@
+"""
+Constant-time-per-step PageRank sampling.
+
+`pagerank.sample_pagerank` rebuilds the full transition model (a dict
+over every page) at each step and draws from it with a fresh weight
+list, so each sample costs O(N). The surfer's next page only ever comes
+from one of two uniform choices, though: with probability
+`damping_factor` a random link on the current page, otherwise (or if
+the page has no links) a random page. Precomputing each page's links as
+an index list makes every step two O(1) draws, so no alias table is
+needed.
+
+`parallel_sample_pagerank` runs independent surfers in a process pool
+and reports a confidence interval for each page's rank.
+"""
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+
+def build_outlinks(corpus):
+    """
+    Return (pages, outlinks) where `pages` lists the page names and
+    `outlinks[i]` lists the indices of the pages `pages[i]` links to.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    outlinks = [
+        [index[link] for link in sorted(corpus[page]) if link in index]
+        for page in pages
+    ]
+    return pages, outlinks
+
+
+def walk(outlinks, damping_factor, n, rng, start=None):
+    """
+    Take `n` samples of a random surfer over `outlinks`, starting at
+    page index `start` (random if not given).
+    Return (visits, page) where `visits[i]` counts the samples on page
+    `i` and `page` is the last page sampled.
+    """
+    page_count = len(outlinks)
+    visits = [0] * page_count
+    page = rng.randrange(page_count) if start is None else start
+    uniform = rng.random
+    for _ in range(n):
+        visits[page] += 1
+        links = outlinks[page]
+        coin = uniform()
+        if coin < damping_factor and links:
+            # coin / damping_factor is itself uniform on [0, 1)
+            page = links[int(coin / damping_factor * len(links))]
+        else:
+            page = int(uniform() * page_count)
+    return visits, page
+
+
+def fast_sample_pagerank(corpus, damping_factor, n, seed=None):
+    """
+    Return PageRank values for each page by sampling `n` pages with
+    a random surfer, starting with a page at random.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    pages, outlinks = build_outlinks(corpus)
+    visits, _ = walk(outlinks, damping_factor, n, random.Random(seed))
+    return {page: count / n for page, count in zip(pages, visits)}
+
+
+# Link lists of the corpus being sampled, set in each pool process
+# by `init_walker` so they are sent once rather than with every task
+walker_outlinks = None
+
+
+def init_walker(outlinks):
+    global walker_outlinks
+    walker_outlinks = outlinks
+
+
+def run_walker(damping_factor, n, state, page):
+    """
+    Continue a walker from its random `state` and current `page` for `n`
+    samples. Return (visits, state, page) to carry into the next round.
+    """
+    rng = random.Random()
+    rng.setstate(state)
+    visits, page = walk(walker_outlinks, damping_factor, n, rng, page)
+    return visits, rng.getstate(), page
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, walkers=8,
+                             processes=None, seed=None, tolerance=None,
+                             rounds=20, confidence=0.95):
+    """
+    Estimate PageRank with `walkers` independent random surfers spread
+    over a pool of `processes`, taking up to `n` samples in total.
+
+    Walker `i` is seeded from (`seed`, `i`), so runs are reproducible for
+    a given seed whatever the number of processes; without a `seed` a
+    random one is drawn. Sampling happens in
+    up to `rounds` rounds; every walker's visits in a round form one
+    batch, and the spread of the batch estimates gives each page a
+    normal-approximation confidence interval at level `confidence`.
+    With `tolerance`, sampling stops after the first round where every
+    interval's half-width is below it.
+
+    Return (ranks, intervals, samples): dictionaries from page name to
+    estimated PageRank and to the half-width of its interval, and the
+    number of samples actually taken.
+    """
+    pages, outlinks = build_outlinks(corpus)
+    page_count = len(pages)
+    # With too few samples for a step per walker per round, run fewer
+    # rounds, then fewer walkers, rather than take more than `n`
+    walkers = max(1, min(walkers, n))
+    rounds = max(1, min(rounds, n // walkers))
+    steps = max(1, n // (walkers * rounds))
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    if seed is None:
+        seed = random.SystemRandom().getrandbits(64)
+    walker_states = []
+    for i in range(walkers):
+        rng = random.Random(f"{seed}-{i}")
+        start = rng.randrange(page_count)
+        walker_states.append((rng.getstate(), start))
+
+    totals = [0] * page_count
+    # Running sums of each page's batch estimates and their squares
+    sums = [0.0] * page_count
+    squares = [0.0] * page_count
+    batches = 0
+    samples = 0
+    intervals = [math.inf] * page_count
+    with ProcessPoolExecutor(processes, initializer=init_walker,
+                             initargs=(outlinks,)) as pool:
+        for _ in range(rounds):
+            futures = [
+                pool.submit(run_walker, damping_factor, steps, state, page)
+                for state, page in walker_states
+            ]
+            walker_states = []
+            for future in futures:
+                visits, state, page = future.result()
+                walker_states.append((state, page))
+                for i, count in enumerate(visits):
+                    if count:
+                        totals[i] += count
+                        estimate = count / steps
+                        sums[i] += estimate
+                        squares[i] += estimate * estimate
+                batches += 1
+                samples += steps
+
+            if batches > 1:
+                for i in range(page_count):
+                    mean = sums[i] / batches
+                    variance = max(
+                        0.0, (squares[i] - batches * mean * mean)
+                        / (batches - 1)
+                    )
+                    intervals[i] = z * math.sqrt(variance / batches)
+                if tolerance is not None and max(intervals) < tolerance:
+                    break
+
+    ranks = {page: totals[i] / samples for i, page in enumerate(pages)}
+    return ranks, dict(zip(pages, intervals)), samples